@@ -0,0 +1,69 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from estadisticas import clave
+from triage import ESTADOS_LEAD_CERRADOS
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Semanas de renovaciones que muestra el dashboard. Se aplica al dibujar:
+# los agregados guardan todas las renovaciones futuras, así los clientes
+# sin cambios siguen contando en un refresco incremental semanas después.
+import os
+SEMANAS_RENOVACION = int(os.environ.get("SEMANAS_RENOVACION", "12"))
+
+# ─── FECHAS ───────────────────────────────────────────────────
+# Los perfiles llegan con fechas "AAAA-MM-DD"; la semana se identifica por
+# su lunes, así las claves ordenan como texto.
+def leer_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor
+    try:
+        return datetime.strptime(str(valor)[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+
+def semana(fecha):
+    return (fecha - timedelta(days=fecha.weekday())).strftime("%Y-%m-%d")
+
+# ─── AGREGADOS POR CLIENTE ────────────────────────────────────
+# Documento compacto que se guarda en vista360 junto al perfil; el
+# dashboard dibuja con él y EstadisticasVista360 lo suma a la cartera.
+def agregados_cliente(perfil, hoy=None):
+    hoy = (hoy or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    renovaciones = Counter()
+
+    centra = perfil.get("datos_centra") or {}
+    prima_mensual = 0
+    if centra.get("estado_poliza") == "Activa":
+        prima_mensual = centra.get("prima_mensual") or 0
+        vencimiento = leer_fecha(centra.get("fecha_vencimiento"))
+        if vencimiento and vencimiento >= hoy:
+            renovaciones[semana(vencimiento)] += 1
+
+    valor_asegurado = 0
+    polizas_vigentes = 0
+    for poliza in perfil.get("datos_flow360") or []:
+        if poliza.get("estado") == "Cancelada":
+            continue
+        polizas_vigentes += 1
+        valor_asegurado += poliza.get("valor_asegurado") or 0
+        renovacion = leer_fecha(poliza.get("fecha_renovacion"))
+        if renovacion and renovacion >= hoy:
+            renovaciones[semana(renovacion)] += 1
+
+    pipeline_por_estado = Counter()
+    pipeline_por_asesor = Counter()
+    for lead in perfil.get("datos_leads") or []:
+        valor = lead.get("valor_estimado") or 0
+        pipeline_por_estado[clave(lead.get("estado_lead"))] += valor
+        if lead.get("estado_lead") not in ESTADOS_LEAD_CERRADOS:
+            pipeline_por_asesor[clave(lead.get("asesor_asignado"))] += valor
+
+    return {
+        "valor_asegurado": valor_asegurado,
+        "prima_mensual": prima_mensual,
+        "polizas_vigentes": polizas_vigentes,
+        "renovaciones_por_semana": dict(sorted(renovaciones.items())),
+        "pipeline_por_estado": dict(pipeline_por_estado),
+        "pipeline_por_asesor": dict(pipeline_por_asesor)
+    }
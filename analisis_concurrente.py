@@ -0,0 +1,140 @@
+import random
+import threading
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from instrumentacion import instrumentos
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+import os
+GEMINI_CONCURRENCIA = int(os.environ.get("GEMINI_CONCURRENCIA", "8"))
+GEMINI_RPM = int(os.environ.get("GEMINI_RPM", "0"))  # 0 = sin límite
+GEMINI_TPM = int(os.environ.get("GEMINI_TPM", "0"))  # 0 = sin límite
+GEMINI_MAX_REINTENTOS = int(os.environ.get("GEMINI_MAX_REINTENTOS", "5"))
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# ─── LIMITADOR DE SOLICITUDES Y TOKENS POR MINUTO ─────────────
+class LimitadorTasa:
+    def __init__(self, solicitudes_por_minuto=0, tokens_por_minuto=0, ventana=60.0):
+        self.solicitudes_por_minuto = solicitudes_por_minuto
+        self.tokens_por_minuto = tokens_por_minuto
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._eventos = deque()  # (instante, tokens)
+        self._tokens_en_ventana = 0
+
+    def adquirir(self, tokens=0):
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                while self._eventos and ahora - self._eventos[0][0] >= self.ventana:
+                    _, usados = self._eventos.popleft()
+                    self._tokens_en_ventana -= usados
+
+                excede_rpm = self.solicitudes_por_minuto and len(self._eventos) >= self.solicitudes_por_minuto
+                # Una solicitud más grande que el límite pasa sola, si no nunca saldría
+                excede_tpm = (
+                    self.tokens_por_minuto and self._eventos
+                    and self._tokens_en_ventana + tokens > self.tokens_por_minuto
+                )
+                if not excede_rpm and not excede_tpm:
+                    self._eventos.append((ahora, tokens))
+                    self._tokens_en_ventana += tokens
+                    return
+                espera = self.ventana - (ahora - self._eventos[0][0])
+            time.sleep(max(espera, 0.001))
+
+def estimar_tokens(texto):
+    # Aproximación de ~4 caracteres por token, suficiente para el limitador
+    return len(texto) // 4 + 1
+
+# ─── REINTENTOS CON BACKOFF EXPONENCIAL ───────────────────────
+def es_error_reintentable(error):
+    codigo = getattr(error, "code", None)
+    if codigo is None:
+        codigo = getattr(error, "status_code", None)
+    return isinstance(codigo, int) and codigo in CODIGOS_REINTENTABLES
+
+def calcular_espera(intento, espera_base=1.0, espera_maxima=60.0):
+    espera = min(espera_maxima, espera_base * (2 ** intento))
+    return espera * random.uniform(0.5, 1.0)
+
+# Envuelve un GenerativeModel aplicando el limitador y los reintentos
+class ModeloControlado:
+    def __init__(self, modelo, limitador=None, max_reintentos=GEMINI_MAX_REINTENTOS,
+                 espera_base=1.0, espera_maxima=60.0, tokens_instruccion=0):
+        self.modelo = modelo
+        self.limitador = limitador
+        # Tokens de la system_instruction, que se cobran en cada llamada
+        self.tokens_instruccion = tokens_instruccion
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+
+    def generate_content(self, prompt, **kwargs):
+        intento = 0
+        while True:
+            if self.limitador:
+                with instrumentos.etapa("gemini.espera_limitador"):
+                    self.limitador.adquirir(estimar_tokens(prompt) + self.tokens_instruccion)
+            try:
+                with instrumentos.etapa("gemini"):
+                    respuesta = self.modelo.generate_content(prompt, **kwargs)
+                instrumentos.contar("gemini.llamadas")
+                instrumentos.registrar_tokens(respuesta)
+                return respuesta
+            except Exception as error:
+                if intento >= self.max_reintentos or not es_error_reintentable(error):
+                    instrumentos.contar("gemini.errores")
+                    raise
+                instrumentos.contar("gemini.reintentos")
+                time.sleep(calcular_espera(intento, self.espera_base, self.espera_maxima))
+                intento += 1
+
+# ─── ANÁLISIS CONCURRENTE ─────────────────────────────────────
+def _descripcion(perfil):
+    if isinstance(perfil, list):
+        return f"lote de {len(perfil)} ({perfil[0].get('cedula')}…)"
+    return perfil.get("cedula")
+
+# Entrega (perfil, analisis) a medida que termina cada análisis, con a lo
+# sumo 2 × concurrencia perfiles en vuelo para no materializar el universo.
+# Si el análisis falla (reintentos agotados o error no reintentable) se
+# entrega (perfil, None): quien consume decide con qué reemplazarlo.
+def analizar_concurrente(perfiles, analizar, concurrencia=GEMINI_CONCURRENCIA):
+    def resultados(futuros):
+        for futuro in futuros:
+            perfil = pendientes.pop(futuro)
+            try:
+                yield perfil, futuro.result()
+            except Exception as error:
+                print(f"⚠️ Error analizando {_descripcion(perfil)}: {error}")
+                instrumentos.contar("analisis.fallidos", len(perfil) if isinstance(perfil, list) else 1)
+                yield perfil, None
+
+    # Hilos con nombre propio para distinguirlos en py-spy
+    with ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix="vista360-gemini") as executor:
+        pendientes = {}
+        for perfil in perfiles:
+            pendientes[executor.submit(analizar, perfil)] = perfil
+            if len(pendientes) >= concurrencia * 2:
+                hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                yield from resultados(hechos)
+        while pendientes:
+            hechos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            yield from resultados(hechos)
+
+# Igual que analizar_concurrente, pero cada tarea analiza un lote de
+# perfiles en una sola solicitud; analizar_lote devuelve los análisis en el
+# mismo orden del lote. Un lote fallido entrega None para cada perfil.
+def analizar_concurrente_por_lotes(perfiles, analizar_lote, tamano_lote, concurrencia=GEMINI_CONCURRENCIA):
+    def lotes():
+        iterador = iter(perfiles)
+        while lote := list(islice(iterador, tamano_lote)):
+            yield lote
+
+    for lote, analisis in analizar_concurrente(lotes(), analizar_lote, concurrencia):
+        yield from zip(lote, analisis or [None] * len(lote))
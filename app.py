@@ -1,6 +1,13 @@
+from datetime import datetime, timedelta
+
+import plotly.graph_objects as go
 import streamlit as st
-from pymongo import MongoClient
-import pandas as pd
+
+from agregados import SEMANAS_RENOVACION, semana
+from busqueda import clave_pagina, filtro_busqueda, filtro_pagina, orden_busqueda
+from cola_asesor import ORDEN_PRIORIDAD, consultar_cola
+from conexion import obtener_cliente
+from estadisticas import leer_estadisticas
 
 # ─── CONFIGURACIÓN ────────────────────────────────────────────
 MONGODB_URI = st.secrets["MONGODB_URI"]
@@ -9,25 +16,92 @@ DATABASE_NAME = st.secrets["DATABASE_NAME"]
 # ─── CONEXIÓN MONGODB ─────────────────────────────────────────
 @st.cache_resource
 def init_connection():
-    return MongoClient(MONGODB_URI)
+    return obtener_cliente(MONGODB_URI)
 
 client = init_connection()
 db = client[DATABASE_NAME]
 
 # ─── CARGAR DATOS ─────────────────────────────────────────────
+# La lista se consulta paginada en el servidor y solo trae los campos que
+# se muestran; el análisis y el perfil completo se leen al seleccionar.
+# Cada página empieza después de la clave de la última fila de la anterior
+# (`despues`), así una página profunda cuesta lo mismo que la primera.
+CLIENTES_POR_PAGINA = 50
+CAMPOS_LISTA = {"_id": 0, "cedula": 1, "nombre": 1, "nombre_normalizado": 1, "ciudad": 1, "fuentes": 1}
+
+@st.cache_data(ttl=300)
+def cargar_clientes(busqueda="", despues=None):
+    return list(
+        db.vista360.find(filtro_pagina(busqueda, despues), CAMPOS_LISTA)
+        .sort(orden_busqueda(busqueda))
+        .limit(CLIENTES_POR_PAGINA)
+    )
+
+@st.cache_data(ttl=300)
+def contar_clientes(busqueda=""):
+    filtro = filtro_busqueda(busqueda)
+    if not filtro:
+        return db.vista360.estimated_document_count()
+    return db.vista360.count_documents(filtro)
+
+# La cola del asesor es una colección materializada por el agente; cada
+# consulta lee las primeras filas de un índice que la cubre.
+COLA_POR_ASESOR = 20
+TODOS_LOS_CLIENTES = "Todos los clientes"
+PRIORIDAD_POR_ORDEN = {orden: prioridad for prioridad, orden in ORDEN_PRIORIDAD.items()}
+ICONOS_PRIORIDAD = {"ALTA": "🔴", "MEDIA": "🟡", "BAJA": "🟢"}
+
 @st.cache_data(ttl=300)
-def cargar_clientes():
-    datos = list(db.vista360.find({}, {
-        "cedula": 1,
-        "nombre": 1,
-        "ciudad": 1,
-        "fuentes": 1,
-        "analisis": 1,
-        "perfil_completo": 1
-    }))
-    for d in datos:
-        d["_id"] = str(d["_id"])
-    return datos
+def cargar_asesores():
+    return sorted(db.cola_asesor.distinct("asesor"))
+
+@st.cache_data(ttl=60)
+def cargar_cola(asesor):
+    return consultar_cola(db.cola_asesor, asesor, COLA_POR_ASESOR)
+
+@st.cache_data(ttl=300)
+def cargar_detalle_cliente(cedula):
+    return db.vista360.find_one({"cedula": cedula}, {"_id": 0})
+
+# Un solo documento precalculado por el agente (vista360_stats); si aún no
+# existe se calcula con una agregación $facet.
+@st.cache_data(ttl=300)
+def cargar_metricas():
+    resumen = leer_estadisticas(db)
+    return {
+        "total": resumen.get("total", 0),
+        "multi_fuente": resumen.get("multi_fuente", 0),
+        "tres_fuentes": resumen.get("tres_fuentes", 0),
+        "ciudades": sum(1 for n in resumen.get("por_ciudad", {}).values() if n > 0),
+        "por_ciudad": resumen.get("por_ciudad", {}),
+        "por_fuente": resumen.get("por_fuente", {}),
+        "valor_asegurado": resumen.get("valor_asegurado", 0),
+        "prima_mensual": resumen.get("prima_mensual", 0),
+        "renovaciones_por_semana": resumen.get("renovaciones_por_semana", {}),
+        "pipeline_por_estado": resumen.get("pipeline_por_estado", {}),
+        "pipeline_por_asesor": resumen.get("pipeline_por_asesor", {})
+    }
+
+# ─── GRÁFICOS ─────────────────────────────────────────────────
+# Se dibujan desde los agregados ya calculados por el agente: el resumen de
+# cartera (vista360_stats) y el campo `agregados` de cada cliente.
+def renovaciones_proximas(por_semana):
+    actual = semana(datetime.now())
+    horizonte = semana(datetime.now() + timedelta(weeks=SEMANAS_RENOVACION))
+    return {s: n for s, n in sorted(por_semana.items()) if actual <= s < horizonte}
+
+def grafico_barras(datos, titulo, horizontal=False, pesos=False):
+    etiquetas, valores = list(datos), list(datos.values())
+    barras = go.Bar(
+        x=valores if horizontal else etiquetas,
+        y=etiquetas if horizontal else valores,
+        orientation="h" if horizontal else "v",
+        marker_color="#00A859",
+        hovertemplate="%{label}: " + ("$%{value:,.0f}" if pesos else "%{value:,}") + "<extra></extra>"
+    )
+    figura = go.Figure(barras)
+    figura.update_layout(title=titulo, height=300, margin=dict(l=10, r=10, t=40, b=10))
+    st.plotly_chart(figura, use_container_width=True)
 
 # ─── CONFIGURACIÓN DE PÁGINA ──────────────────────────────────
 st.set_page_config(
@@ -58,9 +132,9 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ─── CARGAR DATOS ─────────────────────────────────────────────
-clientes = cargar_clientes()
+metricas = cargar_metricas()
 
-if not clientes:
+if not metricas["total"]:
     st.error("No se encontraron clientes en la colección vista360.")
     st.stop()
 
@@ -68,19 +142,35 @@ if not clientes:
 st.markdown("### 📊 Resumen General")
 col1, col2, col3, col4 = st.columns(4)
 
-total = len(clientes)
-multi_fuente = sum(1 for c in clientes if len(c.get("fuentes", [])) > 1)
-tres_fuentes = sum(1 for c in clientes if len(c.get("fuentes", [])) == 3)
-ciudades = len(set(c.get("ciudad", "") for c in clientes))
-
 with col1:
-    st.metric("👥 Clientes Analizados", total)
+    st.metric("👥 Clientes Analizados", metricas["total"])
 with col2:
-    st.metric("🔗 En múltiples CRMs", multi_fuente)
+    st.metric("🔗 En múltiples CRMs", metricas["multi_fuente"])
 with col3:
-    st.metric("🎯 En los 3 CRMs", tres_fuentes)
+    st.metric("🎯 En los 3 CRMs", metricas["tres_fuentes"])
 with col4:
-    st.metric("📍 Ciudades", ciudades)
+    st.metric("📍 Ciudades", metricas["ciudades"])
+
+# ─── CARTERA ──────────────────────────────────────────────────
+st.markdown("### 📈 Cartera")
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("🛡️ Valor asegurado vigente", f"${metricas['valor_asegurado']:,.0f}")
+with col2:
+    st.metric("💵 Prima mensual activa", f"${metricas['prima_mensual']:,.0f}")
+with col3:
+    st.metric("🎯 Pipeline abierto", f"${sum(metricas['pipeline_por_asesor'].values()):,.0f}")
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    grafico_barras(renovaciones_proximas(metricas["renovaciones_por_semana"]), "Renovaciones por semana")
+with col2:
+    grafico_barras(metricas["pipeline_por_estado"], "Pipeline de leads por estado", pesos=True)
+with col3:
+    grafico_barras(
+        dict(sorted(metricas["pipeline_por_asesor"].items(), key=lambda x: x[1])),
+        "Pipeline abierto por asesor", horizontal=True, pesos=True
+    )
 
 st.markdown("---")
 
@@ -90,30 +180,55 @@ col_lista, col_detalle = st.columns([1, 2])
 # ─── LISTA DE CLIENTES ────────────────────────────────────────
 with col_lista:
     st.markdown("### 👥 Clientes")
-    busqueda = st.text_input("🔍 Buscar por nombre o cédula", placeholder="Ej: Eduardo")
-
-    clientes_filtrados = clientes
-    if busqueda:
-        busqueda_lower = busqueda.lower()
-        clientes_filtrados = [
-            c for c in clientes
-            if busqueda_lower in c.get("nombre", "").lower()
-            or busqueda_lower in c.get("cedula", "").lower()
-        ]
-
-    if not clientes_filtrados:
-        st.warning("No se encontraron clientes.")
-    else:
-        for c in clientes_filtrados:
-            fuentes = c.get("fuentes", [])
-            num_fuentes = len(fuentes)
-            emoji = "🟢" if num_fuentes == 3 else "🟡" if num_fuentes == 2 else "🔵"
+    asesor = st.selectbox("👔 Cola del asesor", [TODOS_LOS_CLIENTES, *cargar_asesores()])
+
+    if asesor != TODOS_LOS_CLIENTES:
+        cola = cargar_cola(asesor)
+        if not cola:
+            st.warning("Este asesor no tiene pendientes.")
+        else:
+            st.caption(f"Los {len(cola)} pendientes más urgentes de {asesor}")
+        for fila in cola:
+            icono = ICONOS_PRIORIDAD.get(PRIORIDAD_POR_ORDEN.get(fila["prioridad_orden"]), "⚪")
             if st.button(
-                f"{emoji} {c.get('nombre', 'Sin nombre')} — {c.get('ciudad', '')}",
-                key=c["cedula"],
+                f"{icono} {fila['nombre']} — {fila['motivo']} · {fila['proxima_fecha']:%Y-%m-%d}",
+                key=f"cola_{fila['cedula']}",
                 use_container_width=True
             ):
-                st.session_state["cliente_seleccionado"] = c
+                st.session_state["cliente_seleccionado"] = fila["cedula"]
+    else:
+        busqueda = st.text_input("🔍 Buscar por nombre o cédula", placeholder="Ej: Eduardo")
+
+        total_filtrados = contar_clientes(busqueda)
+        total_paginas = max(1, -(-total_filtrados // CLIENTES_POR_PAGINA))
+        # Claves de inicio de las páginas visitadas: la última es la actual
+        cursores = st.session_state.setdefault(f"paginas_{busqueda}", [None])
+        clientes_filtrados = cargar_clientes(busqueda, cursores[-1])
+
+        col_anterior, col_pagina, col_siguiente = st.columns([1, 2, 1])
+        if col_anterior.button("⬅️", key=f"anterior_{busqueda}", disabled=len(cursores) == 1):
+            cursores.pop()
+            st.rerun()
+        col_pagina.caption(f"Página {len(cursores)} de {total_paginas}")
+        if col_siguiente.button("➡️", key=f"siguiente_{busqueda}",
+                                disabled=len(cursores) >= total_paginas or not clientes_filtrados):
+            cursores.append(clave_pagina(busqueda, clientes_filtrados[-1]))
+            st.rerun()
+
+        if not clientes_filtrados:
+            st.warning("No se encontraron clientes.")
+        else:
+            st.caption(f"{total_filtrados:,} clientes encontrados")
+            for c in clientes_filtrados:
+                fuentes = c.get("fuentes", [])
+                num_fuentes = len(fuentes)
+                emoji = "🟢" if num_fuentes == 3 else "🟡" if num_fuentes == 2 else "🔵"
+                if st.button(
+                    f"{emoji} {c.get('nombre', 'Sin nombre')} — {c.get('ciudad', '')}",
+                    key=c["cedula"],
+                    use_container_width=True
+                ):
+                    st.session_state["cliente_seleccionado"] = c["cedula"]
 
 # ─── DETALLE DEL CLIENTE ──────────────────────────────────────
 with col_detalle:
@@ -125,9 +240,10 @@ with col_detalle:
         </div>
         """, unsafe_allow_html=True)
     else:
-        c = st.session_state["cliente_seleccionado"]
+        c = cargar_detalle_cliente(st.session_state["cliente_seleccionado"]) or {}
         perfil = c.get("perfil_completo", {})
         fuentes = c.get("fuentes", [])
+        agregados = c.get("agregados", {})
 
         st.markdown(f"### 👤 {c.get('nombre', 'Sin nombre')}")
         col_a, col_b, col_c = st.columns(3)
@@ -139,6 +255,18 @@ with col_detalle:
             badges = " ".join([f"`{f}`" for f in fuentes])
             st.markdown(f"**🔗 Fuentes:** {badges}")
 
+        if agregados:
+            col_a, col_b, col_c, col_d = st.columns(4)
+            with col_a:
+                st.metric("Valor asegurado", f"${agregados.get('valor_asegurado', 0):,.0f}")
+            with col_b:
+                st.metric("Prima mensual", f"${agregados.get('prima_mensual', 0):,.0f}")
+            with col_c:
+                st.metric("Pipeline abierto", f"${sum(agregados.get('pipeline_por_asesor', {}).values()):,.0f}")
+            with col_d:
+                proximas = renovaciones_proximas(agregados.get("renovaciones_por_semana", {}))
+                st.metric("Renovaciones próximas", sum(proximas.values()))
+
         st.markdown("---")
 
         tab1, tab2, tab3, tab4 = st.tabs([
@@ -150,6 +278,9 @@ with col_detalle:
 
         with tab1:
             st.markdown("#### 🤖 Análisis Gemini — Recomendaciones para el Asesor")
+            if c.get("prioridad"):
+                icono = ICONOS_PRIORIDAD.get(c["prioridad"], "")
+                st.markdown(f"**Prioridad:** {icono} {c['prioridad']}")
             st.markdown(c.get("analisis", "Sin análisis disponible"))
 
         with tab2:
@@ -172,6 +303,9 @@ with col_detalle:
             datos_flow = perfil.get("datos_flow360", [])
             if datos_flow:
                 st.markdown(f"#### 🚗 Pólizas en FLOW360 ({len(datos_flow)} registros)")
+                proximas = renovaciones_proximas(agregados.get("renovaciones_por_semana", {}))
+                if proximas:
+                    grafico_barras(proximas, "Renovaciones por semana")
                 for i, poliza in enumerate(datos_flow):
                     with st.expander(f"Póliza {i+1}: {poliza.get('ramo', 'N/A')} — {poliza.get('numero_poliza', 'N/A')}"):
                         col1, col2 = st.columns(2)
@@ -190,6 +324,8 @@ with col_detalle:
             datos_leads = perfil.get("datos_leads", [])
             if datos_leads:
                 st.markdown(f"#### 🎯 Leads en Gestor ({len(datos_leads)} registros)")
+                if agregados.get("pipeline_por_estado"):
+                    grafico_barras(agregados["pipeline_por_estado"], "Valor de leads por estado", pesos=True)
                 for i, lead in enumerate(datos_leads):
                     prob = lead.get("probabilidad_cierre", 0)
                     color = "🟢" if prob >= 70 else "🟡" if prob >= 40 else "🔴"
@@ -0,0 +1,45 @@
+import time
+import sys
+
+from analisis_concurrente import LimitadorTasa, ModeloControlado, analizar_concurrente
+from modelo_falso import ModeloFalso
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Mide el throughput del pipeline de análisis contra un modelo falso,
+# sin red ni MongoDB.
+NUM_PERFILES = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+LATENCIA = 0.2
+TASA_ERROR = 0.05
+NIVELES_CONCURRENCIA = [1, 4, 16, 32]
+
+def perfil_sintetico(i):
+    return {
+        "cedula": str(10000000 + i),
+        "nombre": f"Cliente {i}",
+        "fuentes_encontradas": ["CENTRA"],
+        "datos_centra": {"producto": "Vida Individual", "estado_poliza": "Activa"},
+        "datos_flow360": [],
+        "datos_leads": []
+    }
+
+def analizar(modelo_ia):
+    return lambda perfil: modelo_ia.generate_content(str(perfil)).text
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    print(f"🚀 Benchmark de análisis: {NUM_PERFILES} perfiles · latencia {LATENCIA}s · errores {TASA_ERROR:.0%}\n")
+    for concurrencia in NIVELES_CONCURRENCIA:
+        falso = ModeloFalso(latencia=LATENCIA, variacion=LATENCIA / 2, tasa_error=TASA_ERROR, semilla=42)
+        controlado = ModeloControlado(falso, LimitadorTasa(), espera_base=0.05, espera_maxima=1.0)
+        perfiles = (perfil_sintetico(i) for i in range(NUM_PERFILES))
+
+        inicio = time.perf_counter()
+        completados = sum(1 for _, analisis in analizar_concurrente(perfiles, analizar(controlado), concurrencia)
+                          if analisis is not None)
+        duracion = time.perf_counter() - inicio
+
+        print(
+            f"⏱️  concurrencia={concurrencia:>3}: {duracion:6.2f}s · "
+            f"{completados / duracion:6.1f} clientes/s · "
+            f"{completados}/{NUM_PERFILES} ok · {falso.errores} errores reintentados"
+        )
@@ -0,0 +1,76 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Mide el arranque en procesos nuevos, que es lo que paga cada worker spawn
+# de ejecucion_shards y cada cold start de Streamlit. MongoDB apunta a un
+# puerto cerrado: si un import abre conexiones, se nota en el tiempo.
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+URI_LOCAL = "mongodb://127.0.0.1:9/?serverSelectionTimeoutMS=2000"
+ESCENARIOS = {
+    "python": "pass",
+    "generar_datos": "import generar_datos",
+    "vista360_agente": "import vista360_agente",
+    "worker_shards": "import ejecucion_shards",
+    # La página corre en modo bare contra mongomock, sin `streamlit run`
+    "streamlit_app": "import benchmark_suite as b; b.preparar_entorno('mongomock', ''); b.cargar_app()"
+}
+
+# ─── MEDIR ────────────────────────────────────────────────────
+def entorno():
+    variables = dict(os.environ)
+    variables.setdefault("MONGODB_URI", URI_LOCAL)
+    variables.setdefault("GEMINI_API_KEY", "benchmark")
+    variables["PYTHONWARNINGS"] = "ignore"
+    return variables
+
+def medir(codigo, repeticiones):
+    duraciones = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", codigo], cwd=DIRECTORIO, env=entorno(),
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        duraciones.append(time.perf_counter() - inicio)
+    return statistics.median(duraciones)
+
+# Módulos con mayor tiempo acumulado según `python -X importtime`
+def detalle_imports(codigo, top=10):
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo], cwd=DIRECTORIO, env=entorno(),
+        capture_output=True, text=True
+    ).stderr
+    filas = []
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, modulo = linea[len("import time:"):].split("|")
+        nivel = (len(modulo) - len(modulo.lstrip()) - 1) // 2
+        if nivel <= 1:  # el módulo y lo que importa directamente
+            filas.append((int(acumulado), modulo.strip()))
+    return sorted(filas, reverse=True)[:top]
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiempo de arranque de workers y dashboard")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--detalle", choices=ESCENARIOS, help="muestra los imports más costosos")
+    args = parser.parse_args()
+
+    print(f"🚀 Arranque en procesos nuevos (mediana de {args.repeticiones})\n")
+    print(f"{'escenario':<20}{'total ms':>10}{'sin python ms':>15}")
+    base = None
+    for nombre, codigo in ESCENARIOS.items():
+        duracion = medir(codigo, args.repeticiones)
+        base = duracion if base is None else base
+        print(f"{nombre:<20}{duracion * 1000:>10.0f}{(duracion - base) * 1000:>15.0f}")
+
+    if args.detalle:
+        print(f"\n📦 Imports más costosos en {args.detalle}:")
+        for acumulado, modulo in detalle_imports(ESCENARIOS[args.detalle]):
+            print(f"   {acumulado / 1000:>8.1f} ms  {modulo}")
@@ -0,0 +1,49 @@
+import time
+import os
+import sys
+
+import generar_datos
+import vista360_agente as agente
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Se usa una base aparte para no tocar las colecciones reales.
+BENCHMARK_DATABASE_NAME = os.environ.get("BENCHMARK_DATABASE_NAME", "vista360_benchmark")
+NUM_CLIENTES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+# ─── PREPARAR DATOS ───────────────────────────────────────────
+def preparar_datos(num_clientes):
+    db = agente.client[BENCHMARK_DATABASE_NAME]
+    generar_datos.db = db
+    agente.db = db
+    clientes = generar_datos.generar_clientes_base(num_clientes)
+    generar_datos.generar_centra(clientes)
+    generar_datos.generar_flow360(clientes)
+    generar_datos.generar_gestor_leads(clientes)
+    return agente.obtener_todas_cedulas()
+
+# ─── MEDIR ────────────────────────────────────────────────────
+def medir(nombre, funcion, cedulas):
+    inicio = time.perf_counter()
+    perfiles = funcion(cedulas)
+    duracion = time.perf_counter() - inicio
+    print(f"⏱️  {nombre}: {duracion:.2f}s · {len(cedulas) / duracion:,.0f} perfiles/s")
+    return perfiles, duracion
+
+def por_cedula(cedulas):
+    return [agente.consolidar_perfil(c) for c in cedulas]
+
+def masiva(cedulas):
+    return list(agente.consolidar_perfiles(cedulas))
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    print(f"🚀 Benchmark de consolidación con {NUM_CLIENTES} clientes base...")
+    cedulas = preparar_datos(NUM_CLIENTES)
+    print(f"🔍 {len(cedulas)} cédulas únicas\n")
+
+    perfiles_uno, t_uno = medir("consolidar_perfil (3 consultas por cédula)", por_cedula, cedulas)
+    perfiles_lote, t_lote = medir("consolidar_perfiles (consultas $in por lote)", masiva, cedulas)
+
+    if perfiles_uno != perfiles_lote:
+        raise SystemExit("❌ Los perfiles consolidados no coinciden")
+    print(f"\n✅ Perfiles idénticos · aceleración x{t_uno / t_lote:.1f}")
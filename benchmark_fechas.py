@@ -0,0 +1,86 @@
+import argparse
+import random
+import time
+
+import bson
+from bson import ObjectId
+from faker import Faker
+
+import generar_datos
+import vista360_agente as agente
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# CPU por documento en el cliente al consolidar. "python" recibe fechas
+# nativas y las convierte con normalizar_documento; "servidor" recibe lo que
+# entrega ETAPA_NORMALIZAR y solo decodifica el BSON. Con --mongo se mide
+# además consolidar_perfiles contra la base configurada en cada modo.
+def documentos_fuente(num_clientes, semilla):
+    rnd = random.Random(semilla)
+    faker = Faker('es_CO')
+    faker.seed_instance(semilla)
+    clientes = generar_datos.generar_clientes_base(num_clientes, rnd, faker)
+    documentos = (
+        generar_datos.registros_centra(clientes, rnd)
+        + generar_datos.registros_flow360(clientes, rnd)
+        + generar_datos.registros_gestor_leads(clientes, rnd, faker)
+    )
+    return [{"_id": ObjectId(), **d} for d in documentos]
+
+# ─── MEDIR ────────────────────────────────────────────────────
+def cpu_por_documento(procesar, documentos, repeticiones=5):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.process_time()
+        for raw in documentos:
+            procesar(raw)
+        mejor = min(mejor, time.process_time() - inicio)
+    return mejor / len(documentos)
+
+def medir_decodificacion(documentos):
+    nativos = [bson.encode(d) for d in documentos]
+    # Bytes equivalentes a la salida de ETAPA_NORMALIZAR
+    normalizados = [bson.encode(agente.normalizar_documento(dict(d))) for d in documentos]
+    return {
+        "python": cpu_por_documento(lambda raw: agente.normalizar_documento(bson.decode(raw)), nativos),
+        "servidor": cpu_por_documento(bson.decode, normalizados)
+    }
+
+def medir_consolidacion(num_cedulas):
+    cedulas = agente.obtener_todas_cedulas()[:num_cedulas]
+    resultados = {}
+    for modo, en_servidor in (("python", False), ("servidor", True)):
+        agente._normalizar_en_servidor = en_servidor
+        inicio_cpu, inicio = time.process_time(), time.perf_counter()
+        perfiles = list(agente.consolidar_perfiles(cedulas))
+        resultados[modo] = {
+            "cpu_por_perfil": (time.process_time() - inicio_cpu) / len(perfiles),
+            "segundos": time.perf_counter() - inicio,
+            "perfiles": perfiles
+        }
+    if resultados["python"]["perfiles"] != resultados["servidor"]["perfiles"]:
+        raise SystemExit("❌ Los perfiles normalizados en el servidor no coinciden")
+    return resultados
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU por documento de la normalización de fechas")
+    parser.add_argument("--clientes", type=int, default=2000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--mongo", type=int, default=0, metavar="CEDULAS",
+                        help="consolida N cédulas de la base configurada en ambos modos")
+    args = parser.parse_args()
+
+    documentos = documentos_fuente(args.clientes, args.semilla)
+    print(f"🚀 {len(documentos):,} documentos de CENTRA, FLOW360 y Gestor Leads\n")
+    cpu = medir_decodificacion(documentos)
+    print("⏱️  Decodificar + normalizar (CPU del cliente):")
+    print(f"   fechas nativas + normalizar_documento: {cpu['python'] * 1e6:>7.1f} µs/documento")
+    print(f"   normalizado por el servidor:           {cpu['servidor'] * 1e6:>7.1f} µs/documento")
+    print(f"   ahorro: {1 - cpu['servidor'] / cpu['python']:.0%}")
+
+    if args.mongo:
+        resultados = medir_consolidacion(args.mongo)
+        print(f"\n⏱️  consolidar_perfiles con {args.mongo:,} cédulas:")
+        for modo, r in resultados.items():
+            print(f"   {modo:<9} {r['cpu_por_perfil'] * 1e6:>8.1f} µs CPU/perfil · {r['segundos']:.2f}s")
+        print("✅ Perfiles idénticos en ambos modos")
@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+
+import vista360_agente as agente
+from analisis_concurrente import (
+    LimitadorTasa, ModeloControlado, analizar_concurrente, analizar_concurrente_por_lotes, estimar_tokens
+)
+from benchmark_prompts import perfiles_sinteticos
+from modelo_falso import ModeloFalso
+from prompts import instruccion_lote, instruccion_sistema
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Precios en USD por millón de tokens (gemini-2.0-flash por defecto)
+PRECIO_ENTRADA_1M = float(os.environ.get("PRECIO_ENTRADA_1M", "0.10"))
+PRECIO_SALIDA_1M = float(os.environ.get("PRECIO_SALIDA_1M", "0.40"))
+TAMANOS_LOTE = [1, 5, 10, 20]
+
+# ─── MEDIR UN TAMAÑO DE LOTE ──────────────────────────────────
+def medir(perfiles, tamano_lote, concurrencia, latencia, latencia_por_cliente, tasa_omision):
+    falso = ModeloFalso(
+        latencia=latencia, variacion=latencia / 4, semilla=42,
+        latencia_por_cliente=latencia_por_cliente, tasa_omision=tasa_omision
+    )
+    controlado = ModeloControlado(falso, LimitadorTasa(), espera_base=0.05, espera_maxima=1.0)
+
+    inicio = time.perf_counter()
+    if tamano_lote == 1:
+        analizados = analizar_concurrente(
+            iter(perfiles), lambda p: agente.analizar_cliente(p, controlado), concurrencia
+        )
+        instruccion = instruccion_sistema(tabular=agente.PROMPT_FORMATO == "tabular")
+    else:
+        analizados = analizar_concurrente_por_lotes(
+            iter(perfiles), lambda lote: agente.analizar_lote(lote, controlado, controlado),
+            tamano_lote, concurrencia
+        )
+        instruccion = instruccion_lote(tabular=agente.PROMPT_FORMATO != "compacto")
+    estructurados = sum(1 for _, analisis in analizados if isinstance(analisis, dict))
+    duracion = time.perf_counter() - inicio
+
+    # La system_instruction se cobra como entrada en cada llamada
+    tokens_entrada = falso.tokens_entrada + falso.llamadas * estimar_tokens(instruccion)
+    costo = (tokens_entrada * PRECIO_ENTRADA_1M + falso.tokens_salida * PRECIO_SALIDA_1M) / 1_000_000
+    return {
+        "clientes_s": len(perfiles) / duracion,
+        "llamadas": falso.llamadas,
+        "estructurados": estructurados,
+        "costo_cliente": costo / len(perfiles)
+    }
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput y costo por cliente según tamaño de lote")
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--latencia", type=float, default=0.8, help="latencia base por llamada (s)")
+    parser.add_argument("--latencia-por-cliente", type=float, default=0.05, help="latencia extra por cliente en el lote (s)")
+    parser.add_argument("--tasa-omision", type=float, default=0.05, help="fracción de entradas inválidas por lote")
+    args = parser.parse_args()
+
+    perfiles = [p for p in perfiles_sinteticos(args.clientes) if p["fuentes_encontradas"]]
+    print(f"🚀 {len(perfiles)} perfiles · concurrencia {args.concurrencia} · latencia {args.latencia}s\n")
+    print(f"{'K':>4}{'clientes/s':>12}{'llamadas':>10}{'estructurados':>15}{'USD/cliente':>14}")
+    for tamano_lote in TAMANOS_LOTE:
+        r = medir(perfiles, tamano_lote, args.concurrencia, args.latencia,
+                  args.latencia_por_cliente, args.tasa_omision)
+        print(f"{tamano_lote:>4}{r['clientes_s']:>12.1f}{r['llamadas']:>10}"
+              f"{r['estructurados']:>15}{r['costo_cliente']:>14.7f}")
@@ -0,0 +1,81 @@
+import argparse
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from bson import ObjectId
+from faker import Faker
+
+import generar_datos
+import vista360_agente as agente
+from analisis_concurrente import estimar_tokens
+from conexion import obtener_genai
+from prompts import construir_prompt_completo, construir_prompt_compacto, instruccion_sistema
+
+# ─── PERFILES SINTÉTICOS (sin MongoDB) ────────────────────────
+def perfiles_sinteticos(n, semilla=42):
+    rnd = random.Random(semilla)
+    faker = Faker('es_CO')
+    faker.seed_instance(semilla)
+    clientes = generar_datos.generar_clientes_base(n, rnd, faker)
+    por_cedula = defaultdict(lambda: {"centra": None, "flow360": [], "leads": []})
+    for r in generar_datos.registros_centra(clientes, rnd):
+        por_cedula[r["cedula_cliente"]]["centra"] = agente.normalizar_documento({"_id": ObjectId(), **r})
+    for r in generar_datos.registros_flow360(clientes, rnd):
+        por_cedula[r["identificacion"]]["flow360"].append(agente.normalizar_documento({"_id": ObjectId(), **r}))
+    for r in generar_datos.registros_gestor_leads(clientes, rnd, faker):
+        por_cedula[r["documento"]]["leads"].append(agente.normalizar_documento({"_id": ObjectId(), **r}))
+    return [
+        agente.armar_perfil(cedula, d["centra"], d["flow360"], d["leads"])
+        for cedula, d in por_cedula.items()
+    ]
+
+# ─── CONTEO DE TOKENS ─────────────────────────────────────────
+# (nombre, constructor del prompt, instrucción aparte o None si va en el prompt)
+FORMATOS = [
+    ("completo", construir_prompt_completo, None),
+    ("compacto", lambda p: construir_prompt_compacto(p, tabular=False), instruccion_sistema(tabular=False)),
+    ("tabular", lambda p: construir_prompt_compacto(p, tabular=True), instruccion_sistema(tabular=True))
+]
+
+def contador_tokens(con_gemini):
+    if con_gemini:
+        return lambda texto: agente.modelo.count_tokens(texto).total_tokens
+    return estimar_tokens
+
+def medir_latencia(prompts, instruccion):
+    modelo_ia = obtener_genai().GenerativeModel(agente.GEMINI_MODELO, system_instruction=instruccion)
+    latencias = []
+    for prompt in prompts:
+        inicio = time.perf_counter()
+        modelo_ia.generate_content(prompt)
+        latencias.append(time.perf_counter() - inicio)
+    return statistics.mean(latencias)
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reporte de tokens por cliente según formato de prompt")
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--contar-con-gemini", action="store_true", help="usa count_tokens de la API")
+    parser.add_argument("--latencia", type=int, default=0, help="clientes a enviar a Gemini para medir latencia")
+    args = parser.parse_args()
+
+    perfiles = [p for p in perfiles_sinteticos(args.clientes) if p["fuentes_encontradas"]]
+    contar = contador_tokens(args.contar_con_gemini)
+    print(f"🚀 {len(perfiles)} perfiles · instrucción del sistema: "
+          f"{contar(instruccion_sistema(tabular=True))} tokens (tabular)\n")
+    print(f"{'formato':<10}{'prompt':>9}{'+instr.':>9}{'reducción':>11}{'latencia':>10}")
+
+    base = None
+    for nombre, construir, instruccion in FORMATOS:
+        prompts = [construir(p) for p in perfiles]
+        tokens_prompt = statistics.mean(contar(p) for p in prompts)
+        # La system_instruction se cobra en cada llamada
+        tokens_llamada = tokens_prompt + (contar(instruccion) if instruccion else 0)
+        base = base or tokens_llamada
+        latencia = f"{medir_latencia(prompts[:args.latencia], instruccion):.2f}s" if args.latencia else "—"
+        print(
+            f"{nombre:<10}{tokens_prompt:>9.0f}{tokens_llamada:>9.0f}"
+            f"{1 - tokens_llamada / base:>11.0%}{latencia:>10}"
+        )
@@ -0,0 +1,268 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Suite sin servicios externos: MongoDB es mongomock (en memoria) o un
+# mongod local, y Gemini es el ModeloFalso con latencia configurable.
+# Requiere mongomock para --motor mongomock.
+BENCHMARK_DATABASE_NAME = os.environ.get("BENCHMARK_DATABASE_NAME", "vista360_benchmark")
+DIRECTORIO_RESULTADOS = os.environ.get("BENCHMARK_RESULTADOS", "benchmarks")
+LINEA_BASE = os.path.join(DIRECTORIO_RESULTADOS, "linea_base.json")
+# Un escenario es regresión si tarda más que la línea base más esta fracción
+TOLERANCIA = float(os.environ.get("BENCHMARK_TOLERANCIA", "0.20"))
+TAMANOS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+TAMANO_LOTE_FIXTURE = 10_000
+BUSQUEDAS_DASHBOARD = {"sin_filtro": "", "nombre": "maria", "cedula": "10"}
+# Fecha fija para las fechas del fixture: corridas de días distintos miden
+# los mismos datos que la línea base
+FECHA_REFERENCIA_FIXTURE = os.environ.get("BENCHMARK_FECHA_REFERENCIA", "2025-01-01")
+
+# ─── ENTORNO ──────────────────────────────────────────────────
+# La conexión se crea en el primer uso (conexion.obtener_cliente), pero
+# DATABASE_NAME se lee al importar los módulos: el entorno y el motor de
+# MongoDB se fijan antes de importarlos.
+def preparar_entorno(motor, uri):
+    os.environ["DATABASE_NAME"] = BENCHMARK_DATABASE_NAME
+    if motor == "mongomock":
+        import mongomock
+        import pymongo
+        cliente = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *args, **kwargs: cliente
+    else:
+        os.environ["MONGODB_URI"] = uri
+
+def cargar_app():
+    # Fuera de `streamlit run` la página corre en modo bare; los secretos
+    # apuntan a la base del benchmark.
+    import streamlit as st
+    from streamlit import config, logger
+    config.get_option("logger.level")  # fuerza la lectura de config antes de bajar el nivel
+    logger.set_log_level("error")
+    st.secrets = {"MONGODB_URI": os.environ.get("MONGODB_URI", ""), "DATABASE_NAME": BENCHMARK_DATABASE_NAME}
+    return importlib.import_module("app")
+
+# ─── FIXTURE ──────────────────────────────────────────────────
+# Con un mongod local el fixture persiste entre corridas: solo se regenera
+# si cambian el tamaño, la semilla o la fecha de referencia.
+def poblar_fuentes(db, num_clientes, semilla):
+    import generar_datos
+
+    marca = {"_id": "fixture", "num_clientes": num_clientes, "semilla": semilla,
+             "referencia": FECHA_REFERENCIA_FIXTURE}
+    if db.benchmark_control.find_one({"_id": "fixture"}) == marca:
+        print(f"♻️  Fixture de {num_clientes:,} clientes ya cargado")
+        return
+    for coleccion in ("centra", "flow360", "gestor_leads"):
+        db[coleccion].drop()
+    num_lotes = -(-num_clientes // TAMANO_LOTE_FIXTURE)
+    referencia = generar_datos.fecha_referencia(FECHA_REFERENCIA_FIXTURE)
+    for numero_lote in range(num_lotes):
+        lote = generar_datos.generar_lote(numero_lote, TAMANO_LOTE_FIXTURE, num_clientes, semilla, referencia)
+        for coleccion, registros in lote.items():
+            if registros:
+                db[coleccion].insert_many(registros, ordered=False)
+        print(f"   📦 Fixture {numero_lote + 1}/{num_lotes}")
+    db.benchmark_control.replace_one({"_id": "fixture"}, marca, upsert=True)
+
+# vista360 completa para el dashboard, con un análisis fijo en lugar del LLM
+def poblar_vista360(agente):
+    from cola_asesor import ColaAsesor
+    from estadisticas import EstadisticasVista360
+    from indices import INDICES
+
+    for coleccion in ("vista360", "cola_asesor"):
+        agente.db[coleccion].drop()
+        agente.db[coleccion].create_indexes(INDICES[coleccion])
+    estadisticas = EstadisticasVista360(agente.db.vista360_stats)
+    escritor = agente.EscritorVista360(
+        agente.db.vista360, estadisticas=estadisticas, cola=ColaAsesor(agente.db.cola_asesor)
+    )
+    for perfil in agente.consolidar_perfiles():
+        escritor.agregar(agente.documento_vista360(perfil, "Análisis de benchmark"))
+    escritor.vaciar()
+    estadisticas.reemplazar()
+    return escritor.escritos
+
+# ─── MEDICIÓN ─────────────────────────────────────────────────
+# Con varias repeticiones, una primera llamada sin medir calienta cachés
+# e índices; se reporta la mediana.
+def cronometrar(funcion, repeticiones):
+    if repeticiones > 1:
+        funcion()
+    duraciones = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - inicio)
+    return duraciones
+
+def resultado(duraciones, operaciones=1):
+    mediana = statistics.median(duraciones)
+    ordenadas = sorted(duraciones)
+    return {
+        "segundos": round(mediana, 6),
+        "p95_s": round(ordenadas[min(len(ordenadas) - 1, int(0.95 * len(ordenadas)))], 6),
+        "por_segundo": round(operaciones / mediana, 2) if mediana else None,
+        "repeticiones": len(duraciones)
+    }
+
+# ─── ESCENARIOS ───────────────────────────────────────────────
+def escenario_consolidar_perfil(agente, cedulas, muestra):
+    seleccion = cedulas[::max(1, len(cedulas) // muestra)][:muestra]
+    duraciones = cronometrar(lambda: [agente.consolidar_perfil(c) for c in seleccion], 3)
+    return resultado(duraciones, len(seleccion))
+
+def escenario_obtener_todas_cedulas(agente, repeticiones):
+    return resultado(cronometrar(agente.obtener_todas_cedulas, repeticiones))
+
+def escenario_generar_vista360_todos(agente, limite, latencia, concurrencia):
+    from modelo_falso import ModeloFalso
+
+    # Sin caché previa, cada corrida analiza los mismos clientes desde cero
+    agente.db.vista360_cache.drop()
+    falso = ModeloFalso(latencia=latencia, variacion=latencia / 4, semilla=42)
+    duraciones = cronometrar(
+        lambda: agente.generar_vista360_todos(falso, concurrencia, limite=limite, triage_top=0), 1
+    )
+    medicion = resultado(duraciones, limite)
+    medicion["llamadas_llm"] = falso.llamadas
+    return medicion
+
+# La página media se pide con la clave de la fila anterior, como la pide el
+# dashboard al avanzar; la clave se busca antes de medir.
+def clave_pagina_media(app):
+    from busqueda import clave_pagina, orden_busqueda
+
+    total = app.contar_clientes("")
+    anterior = list(
+        app.db.vista360.find({}, app.CAMPOS_LISTA).sort(orden_busqueda(""))
+        .skip(max(0, total // app.CLIENTES_POR_PAGINA // 2 * app.CLIENTES_POR_PAGINA - 1)).limit(1)
+    )
+    return clave_pagina("", anterior[0]) if anterior else None
+
+def escenarios_cargar_clientes(app, repeticiones):
+    mediciones = {}
+    paginas = {"pagina_0": None, "pagina_media": clave_pagina_media(app)}
+    for nombre_busqueda, busqueda in BUSQUEDAS_DASHBOARD.items():
+        for nombre_pagina, despues in paginas.items():
+            if busqueda and despues:
+                continue
+
+            def cargar():
+                # Sin la caché de Streamlit: se mide la consulta
+                app.cargar_clientes.clear()
+                app.cargar_clientes(busqueda, despues)
+
+            mediciones[f"cargar_clientes.{nombre_busqueda}.{nombre_pagina}"] = resultado(
+                cronometrar(cargar, repeticiones)
+            )
+    return mediciones
+
+# La cola del asesor debe responder en menos de 100 ms a cualquier escala
+def escenario_cargar_cola(app, repeticiones):
+    asesores = app.cargar_asesores()
+
+    def cargar():
+        app.cargar_cola.clear()
+        app.cargar_cola(asesores[0])
+
+    return {"cargar_cola": resultado(cronometrar(cargar, repeticiones))} if asesores else {}
+
+# ─── LÍNEA BASE ───────────────────────────────────────────────
+def leer_linea_base():
+    if not os.path.exists(LINEA_BASE):
+        return {}
+    with open(LINEA_BASE, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+def guardar_json(ruta, contenido):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        json.dump(contenido, archivo, ensure_ascii=False, indent=2)
+
+def comparar(escenarios, base, tolerancia=TOLERANCIA):
+    regresiones = []
+    print(f"\n{'escenario':<44}{'actual s':>11}{'base s':>11}{'cambio':>9}")
+    print("─" * 75)
+    for nombre, medicion in escenarios.items():
+        anterior = base.get(nombre)
+        if not anterior:
+            print(f"{nombre:<44}{medicion['segundos']:>11.4f}{'—':>11}{'nuevo':>9}")
+            continue
+        cambio = medicion["segundos"] / anterior["segundos"] - 1 if anterior["segundos"] else 0.0
+        marca = " ❌" if cambio > tolerancia else ""
+        print(f"{nombre:<44}{medicion['segundos']:>11.4f}{anterior['segundos']:>11.4f}{cambio:>+9.0%}{marca}")
+        if cambio > tolerancia:
+            regresiones.append(nombre)
+    return regresiones
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks offline de VISTA 360 con línea base")
+    parser.add_argument("--tamano", choices=TAMANOS, default="1k", help="clientes del fixture")
+    parser.add_argument("--motor", choices=["mongomock", "mongod"], default="mongomock",
+                        help="mongomock en memoria o un mongod local (recomendado desde 100k)")
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="URI del mongod local")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--muestra", type=int, default=200, help="cédulas para consolidar_perfil")
+    parser.add_argument("--limite", type=int, default=500, help="clientes de la corrida completa")
+    parser.add_argument("--latencia", type=float, default=0.05, help="latencia del modelo falso (s)")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--guardar-linea-base", action="store_true",
+                        help="guarda esta corrida como línea base de su motor y tamaño")
+    args = parser.parse_args()
+
+    num_clientes = TAMANOS[args.tamano]
+    clave_base = f"{args.motor}-{args.tamano}"
+    print(f"🚀 Benchmark {clave_base}: {num_clientes:,} clientes · latencia LLM {args.latencia}s\n")
+
+    preparar_entorno(args.motor, args.uri)
+    import vista360_agente as agente
+
+    poblar_fuentes(agente.db, num_clientes, args.semilla)
+    escenarios = {}
+    escenarios["obtener_todas_cedulas"] = escenario_obtener_todas_cedulas(agente, args.repeticiones)
+    cedulas = agente.obtener_todas_cedulas()
+    escenarios["consolidar_perfil"] = escenario_consolidar_perfil(agente, cedulas, args.muestra)
+    limite = min(args.limite, len(cedulas))
+    escenarios["generar_vista360_todos"] = escenario_generar_vista360_todos(
+        agente, limite, args.latencia, args.concurrencia
+    )
+    print(f"\n📋 Cargando vista360 con {poblar_vista360(agente):,} clientes para el dashboard...")
+    app = cargar_app()
+    escenarios.update(escenarios_cargar_clientes(app, args.repeticiones))
+    escenarios.update(escenario_cargar_cola(app, args.repeticiones))
+
+    corrida = {
+        "fecha": datetime.now().isoformat(),
+        "motor": args.motor,
+        "tamano": args.tamano,
+        "parametros": vars(args),
+        "python": platform.python_version(),
+        "maquina": platform.node(),
+        "escenarios": escenarios
+    }
+    ruta = os.path.join(DIRECTORIO_RESULTADOS, f"resultados_{clave_base}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    guardar_json(ruta, corrida)
+    print(f"\n💾 Resultados en {ruta}")
+
+    linea_base = leer_linea_base()
+    regresiones = comparar(escenarios, linea_base.get(clave_base, {}).get("escenarios", {}))
+    if args.guardar_linea_base:
+        linea_base[clave_base] = corrida
+        guardar_json(LINEA_BASE, linea_base)
+        print(f"\n📌 Línea base {clave_base} actualizada en {LINEA_BASE}")
+    elif clave_base not in linea_base:
+        print(f"\nℹ️ Sin línea base para {clave_base}; usar --guardar-linea-base para fijarla")
+    if regresiones:
+        print(f"\n❌ {len(regresiones)} regresiones de más de {TOLERANCIA:.0%}: {', '.join(regresiones)}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones")
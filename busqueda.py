@@ -0,0 +1,58 @@
+import re
+import unicodedata
+
+# ─── NORMALIZACIÓN PARA BÚSQUEDA ──────────────────────────────
+# vista360 guarda el nombre normalizado (minúsculas, sin tildes) y sus
+# palabras en terminos_busqueda; con índices sobre esos campos y sobre
+# cedula, la búsqueda del dashboard es un rango de índice por prefijo
+# en lugar de un recorrido de la colección.
+def normalizar_texto(texto):
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(texto.lower().split())
+
+def campos_busqueda(nombre):
+    nombre_normalizado = normalizar_texto(nombre)
+    return {
+        "nombre_normalizado": nombre_normalizado,
+        "terminos_busqueda": nombre_normalizado.split()
+    }
+
+def filtro_busqueda(texto):
+    texto = normalizar_texto(texto)
+    if not texto:
+        return {}
+    if texto.isdigit():
+        return {"cedula": {"$regex": f"^{texto}"}}
+    # Cada palabra buscada debe ser prefijo de alguna palabra del nombre
+    return {"$and": [
+        {"terminos_busqueda": re.compile(f"^{re.escape(palabra)}")}
+        for palabra in texto.split()
+    ]}
+
+# ─── ORDEN Y PAGINACIÓN ───────────────────────────────────────
+# Por cédula se ordena por cédula: el mismo rango del índice que filtra da
+# el orden, sin ordenar en memoria las coincidencias de un prefijo corto.
+# Por nombre se ordena por nombre con la cédula como desempate.
+def orden_busqueda(texto):
+    if normalizar_texto(texto).isdigit():
+        return [("cedula", 1)]
+    return [("nombre_normalizado", 1), ("cedula", 1)]
+
+def clave_pagina(texto, documento):
+    return tuple(documento[campo] for campo, _ in orden_busqueda(texto))
+
+# Paginación por clave: la página siguiente empieza después de la clave de
+# la última fila vista, en lugar de saltar (skip) las anteriores.
+def filtro_pagina(texto, despues=None):
+    filtro = filtro_busqueda(texto)
+    if not despues:
+        return filtro
+    if len(despues) == 1:
+        return {**filtro, "cedula": {**filtro.get("cedula", {}), "$gt": despues[0]}}
+    nombre, cedula = despues
+    siguiente = {"$or": [
+        {"nombre_normalizado": {"$gt": nombre}},
+        {"nombre_normalizado": nombre, "cedula": {"$gt": cedula}}
+    ]}
+    return {"$and": [filtro, siguiente]} if filtro else siguiente
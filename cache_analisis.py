@@ -0,0 +1,92 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import OperationFailure
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+import os
+CACHE_TTL_DIAS = int(os.environ.get("CACHE_TTL_DIAS", "7"))
+
+# Códigos de MongoDB al crear un índice que ya existe con otras opciones
+CODIGOS_CONFLICTO_INDICE = {85, 86}  # IndexOptionsConflict, IndexKeySpecsConflict
+
+# Campos internos que no cambian el contenido que ve Gemini
+CAMPOS_EXCLUIDOS_HUELLA = {"_id", "created_at"}
+
+# ─── HUELLA DEL PERFIL ────────────────────────────────────────
+def normalizar_para_huella(valor):
+    if isinstance(valor, dict):
+        return {
+            k: normalizar_para_huella(v)
+            for k, v in valor.items()
+            if k not in CAMPOS_EXCLUIDOS_HUELLA
+        }
+    if isinstance(valor, list):
+        return [normalizar_para_huella(v) for v in valor]
+    return valor
+
+def huella_perfil(perfil, version_prompt):
+    contenido = json.dumps(
+        {"version_prompt": version_prompt, "perfil": normalizar_para_huella(perfil)},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+# ─── CACHÉ DE ANÁLISIS ────────────────────────────────────────
+# Un documento por huella (_id = huella). El índice TTL sobre creado_en
+# expulsa las entradas viejas, de modo que los análisis que dependen de
+# la fecha (vencimientos, seguimientos) se regeneran al menos cada
+# CACHE_TTL_DIAS aunque el perfil no cambie. creado_en se guarda en UTC,
+# que es contra lo que compara el monitor TTL.
+def ahora_utc():
+    # pymongo devuelve las fechas como UTC sin zona; se compara igual
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class CacheAnalisis:
+    def __init__(self, coleccion, ttl_dias=CACHE_TTL_DIAS):
+        self.coleccion = coleccion
+        self.ttl = timedelta(days=ttl_dias)
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+    def asegurar_indices(self):
+        segundos = int(self.ttl.total_seconds())
+        try:
+            self.coleccion.create_index("creado_en", expireAfterSeconds=segundos)
+        except OperationFailure as error:
+            if error.code not in CODIGOS_CONFLICTO_INDICE:
+                raise
+            # El índice existe con otro CACHE_TTL_DIAS: se cambia en su lugar
+            self.coleccion.database.command(
+                "collMod", self.coleccion.name,
+                index={"keyPattern": {"creado_en": 1}, "expireAfterSeconds": segundos}
+            )
+
+    def obtener(self, huella):
+        doc = self.coleccion.find_one({"_id": huella}, {"analisis": 1, "creado_en": 1})
+        # El monitor TTL de MongoDB corre cada minuto; se valida aquí también
+        vigente = doc is not None and ahora_utc() - doc["creado_en"] < self.ttl
+        with self._lock:
+            if vigente:
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+        return doc["analisis"] if vigente else None
+
+    def guardar(self, huella, cedula, analisis):
+        self.coleccion.replace_one(
+            {"_id": huella},
+            {"cedula": cedula, "analisis": analisis, "creado_en": ahora_utc()},
+            upsert=True
+        )
+
+    def resumen(self):
+        consultas = self.aciertos + self.fallos
+        tasa = self.aciertos / consultas if consultas else 0
+        return f"💾 Caché: {self.aciertos} aciertos · {self.fallos} fallos · {tasa:.0%} de acierto"
@@ -0,0 +1,90 @@
+import re
+from datetime import timedelta
+
+from agregados import leer_fecha
+from triage import DIAS_SIN_SEGUIMIENTO, ESTADOS_LEAD_CERRADOS
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Orden de la cola: prioridad del análisis y luego la fecha más próxima
+ORDEN_PRIORIDAD = {"ALTA": 0, "MEDIA": 1, "BAJA": 2}
+SIN_PRIORIDAD = 3
+PATRON_PRIORIDAD = re.compile(r"prioridad\W{0,6}(ALTA|MEDIA|BAJA)", re.IGNORECASE)
+# Campos de cada fila: todos están en el índice, así la consulta del
+# dashboard es cubierta (sin FETCH ni SORT)
+CAMPOS_COLA = {"_id": 0, "asesor": 1, "prioridad_orden": 1, "proxima_fecha": 1,
+               "cedula": 1, "nombre": 1, "motivo": 1}
+
+# ─── PRIORIDAD DEL ANÁLISIS ───────────────────────────────────
+# Estructurada en los análisis por lotes; en el markdown individual y en el
+# resumen por reglas se lee del texto; si no, la del triage.
+def prioridad_documento(documento):
+    if documento.get("prioridad"):
+        return documento["prioridad"]
+    encontrada = PATRON_PRIORIDAD.search(documento.get("analisis") or "")
+    if encontrada:
+        return encontrada.group(1).upper()
+    return (documento.get("triage") or {}).get("prioridad")
+
+# ─── FILAS DE LA COLA ─────────────────────────────────────────
+# Una fila por asesor y cliente, con lo más próximo que ese asesor tiene
+# pendiente: vencimiento en CENTRA, renovación en FLOW360 o seguimiento de
+# un lead abierto. Las fechas pasadas quedan primero: están atrasadas.
+def filas_cola(documento):
+    perfil = documento.get("perfil_completo") or {}
+    pendientes = {}
+
+    def agregar(asesor, fecha, motivo):
+        fecha = leer_fecha(fecha)
+        if asesor and fecha and (asesor not in pendientes or fecha < pendientes[asesor][0]):
+            pendientes[asesor] = (fecha, motivo)
+
+    centra = perfil.get("datos_centra") or {}
+    if centra:
+        agregar(centra.get("asesor"), centra.get("fecha_vencimiento"),
+                f"Vencimiento {centra.get('producto', 'póliza')}")
+    for poliza in perfil.get("datos_flow360") or []:
+        if poliza.get("estado") != "Cancelada":
+            agregar(poliza.get("ejecutivo"), poliza.get("fecha_renovacion"),
+                    f"Renovación {poliza.get('ramo', 'póliza')}")
+    for lead in perfil.get("datos_leads") or []:
+        seguimiento = leer_fecha(lead.get("fecha_ultimo_seguimiento"))
+        if lead.get("estado_lead") not in ESTADOS_LEAD_CERRADOS and seguimiento:
+            agregar(lead.get("asesor_asignado"), seguimiento + timedelta(days=DIAS_SIN_SEGUIMIENTO),
+                    f"Seguimiento lead {lead.get('producto_interes', '')}".strip())
+
+    orden = ORDEN_PRIORIDAD.get(prioridad_documento(documento), SIN_PRIORIDAD)
+    return [
+        {
+            "_id": f"{asesor}|{documento['cedula']}",
+            "asesor": asesor,
+            "prioridad_orden": orden,
+            "proxima_fecha": fecha,
+            "cedula": documento["cedula"],
+            "nombre": documento.get("nombre", "Sin nombre"),
+            "motivo": motivo
+        }
+        for asesor, (fecha, motivo) in pendientes.items()
+    ]
+
+# ─── COLA MATERIALIZADA ───────────────────────────────────────
+# La mantiene EscritorVista360 al escribir cada lote. En una reconstrucción
+# se llena la colección sombra; en upsert se reemplazan las filas de las
+# cédulas del lote (un cliente puede cambiar de asesor).
+class ColaAsesor:
+    def __init__(self, coleccion):
+        self.coleccion = coleccion
+
+    def escribir(self, documentos, upsert=False):
+        filas = [fila for d in documentos for fila in filas_cola(d)]
+        if upsert:
+            self.coleccion.delete_many({"cedula": {"$in": [d["cedula"] for d in documentos]}})
+        if filas:
+            self.coleccion.insert_many(filas, ordered=False)
+
+# ─── CONSULTA DEL DASHBOARD ───────────────────────────────────
+def consultar_cola(coleccion, asesor, limite=20):
+    return list(
+        coleccion.find({"asesor": asesor}, CAMPOS_COLA)
+        .sort([("prioridad_orden", 1), ("proxima_fecha", 1)])
+        .limit(limite)
+    )
@@ -0,0 +1,76 @@
+import os
+import threading
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Nada se conecta al importar: el cliente de MongoDB y Gemini se crean en el
+# primer uso y se reutilizan en el proceso (agente, generador y dashboard).
+MONGO_MAX_POOL = int(os.environ.get("MONGO_MAX_POOL", "50"))
+MONGO_MIN_POOL = int(os.environ.get("MONGO_MIN_POOL", "0"))
+MONGO_TIMEOUT_SELECCION_MS = int(os.environ.get("MONGO_TIMEOUT_SELECCION_MS", "10000"))
+MONGO_TIMEOUT_CONEXION_MS = int(os.environ.get("MONGO_TIMEOUT_CONEXION_MS", "10000"))
+MONGO_TIMEOUT_SOCKET_MS = int(os.environ.get("MONGO_TIMEOUT_SOCKET_MS", "120000"))
+# Tiempo máximo esperando una conexión libre del pool (0 = sin límite)
+MONGO_ESPERA_POOL_MS = int(os.environ.get("MONGO_ESPERA_POOL_MS", "0"))
+
+_lock = threading.Lock()
+_clientes = {}
+_genai = None
+
+# ─── MONGODB ──────────────────────────────────────────────────
+# MongoClient no sobrevive a un fork: el cliente se guarda por proceso.
+# Sin URI se pasa None y pymongo usa localhost ("" no es un host válido).
+def obtener_cliente(uri=None):
+    uri = uri or os.environ.get("MONGODB_URI") or None
+    clave = (os.getpid(), uri)
+    with _lock:
+        if clave not in _clientes:
+            from pymongo import MongoClient
+            from instrumentacion import EscuchaMongo, instrumentos
+
+            opciones = {
+                "maxPoolSize": MONGO_MAX_POOL,
+                "minPoolSize": MONGO_MIN_POOL,
+                "serverSelectionTimeoutMS": MONGO_TIMEOUT_SELECCION_MS,
+                "connectTimeoutMS": MONGO_TIMEOUT_CONEXION_MS,
+                "socketTimeoutMS": MONGO_TIMEOUT_SOCKET_MS,
+                "event_listeners": [EscuchaMongo(instrumentos)]
+            }
+            if MONGO_ESPERA_POOL_MS:
+                opciones["waitQueueTimeoutMS"] = MONGO_ESPERA_POOL_MS
+            _clientes[clave] = MongoClient(uri, **opciones)
+        return _clientes[clave]
+
+def obtener_db(nombre=None, uri=None):
+    return obtener_cliente(uri)[nombre or os.environ.get("DATABASE_NAME", "vista360")]
+
+def cerrar_clientes():
+    with _lock:
+        for (pid, _), cliente in list(_clientes.items()):
+            if pid == os.getpid():
+                cliente.close()
+        _clientes.clear()
+
+# ─── GEMINI ───────────────────────────────────────────────────
+# google.generativeai tarda más de un segundo en importarse; solo lo pagan
+# los procesos que de verdad llaman al modelo.
+def obtener_genai():
+    global _genai
+    with _lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=os.environ.get("GEMINI_API_KEY", ""))
+            _genai = genai
+        return _genai
+
+# ─── OBJETO DIFERIDO ──────────────────────────────────────────
+# Se comporta como el objeto que crea `fabrica`, pero no la llama hasta el
+# primer acceso; así `db` puede seguir siendo un global del módulo.
+class Diferido:
+    def __init__(self, fabrica):
+        self._fabrica = fabrica
+
+    def __getattr__(self, nombre):
+        return getattr(self._fabrica(), nombre)
+
+    def __getitem__(self, nombre):
+        return self._fabrica()[nombre]
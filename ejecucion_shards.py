@@ -0,0 +1,214 @@
+import argparse
+import multiprocessing
+import os
+import socket
+from datetime import datetime, timedelta
+from itertools import islice
+
+from pymongo import ReturnDocument
+from pymongo.errors import CursorNotFound
+
+import vista360_agente as agente
+from analisis_concurrente import GEMINI_CONCURRENCIA, GEMINI_RPM, GEMINI_TPM, LimitadorTasa
+from cola_asesor import ColaAsesor
+from estadisticas import EstadisticasVista360
+from indices import crear_indices
+from instrumentacion import instrumentos
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+DURACION_LEASE = timedelta(minutes=int(os.environ.get("SHARD_LEASE_MINUTOS", "10")))
+TAMANO_LOTE_SHARD = int(os.environ.get("SHARD_TAMANO_LOTE", "200"))
+
+# ─── CHECKPOINTS Y LEASES ─────────────────────────────────────
+# Un documento por shard en vista360_shards, con su rango de cédulas
+# (desde, hasta]: los límites salen una sola vez de limites_cedulas y cada
+# shard lee solo su rango de los índices. Un worker toma el shard con un
+# lease que renueva en cada lote; si el proceso muere, el lease vence y
+# otro worker (de esta máquina o de otra) lo retoma desde ultima_cedula.
+# Las cédulas cuyo análisis falló quedan en `fallidas` (en vista360 con el
+# resumen por reglas); al retomar un trabajo, los shards completados que aún
+# las tienen se reabren para reintentarlas.
+def preparar_trabajo(db, trabajo, num_shards):
+    db.vista360_shards.create_index([("trabajo", 1), ("estado", 1), ("lease_hasta", 1)])
+    # Los shards escriben sobre vista360 y cola_asesor vivas y leen rangos de
+    # las fuentes: sin sus índices (base sin reconstrucción completa) cada
+    # lote sería un recorrido de la colección
+    crear_indices(db)
+    db.vista360_shards.update_many(
+        {"trabajo": trabajo, "estado": "completado", "fallidas.0": {"$exists": True}},
+        {"$set": {"estado": "pendiente"}}
+    )
+    if db.vista360_shards.count_documents({"trabajo": trabajo}):
+        return  # al retomar se conservan los rangos originales
+    # Con pocos clientes puede haber menos rangos que los shards pedidos
+    limites = agente.limites_cedulas(num_shards)
+    rangos = list(zip([None, *limites], [*limites, None]))
+    for shard, (desde, hasta) in enumerate(rangos):
+        db.vista360_shards.update_one(
+            {"_id": f"{trabajo}:{shard}"},
+            {"$setOnInsert": {
+                "trabajo": trabajo,
+                "shard": shard,
+                "num_shards": len(rangos),
+                "desde": desde,
+                "hasta": hasta,
+                "estado": "pendiente",
+                "propietario": None,
+                "lease_hasta": None,
+                "ultima_cedula": desde,
+                "procesados": 0,
+                "fallidas": []
+            }},
+            upsert=True
+        )
+
+def tomar_shard(db, trabajo, propietario):
+    ahora = datetime.now()
+    return db.vista360_shards.find_one_and_update(
+        {
+            "trabajo": trabajo,
+            "estado": {"$ne": "completado"},
+            "$or": [{"lease_hasta": None}, {"lease_hasta": {"$lt": ahora}}]
+        },
+        {"$set": {
+            "estado": "en_curso",
+            "propietario": propietario,
+            "lease_hasta": ahora + DURACION_LEASE
+        }},
+        sort=[("shard", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+def registrar_avance(db, shard, propietario, ultima_cedula, procesados, fallidas=()):
+    resultado = db.vista360_shards.update_one(
+        {"_id": shard["_id"], "propietario": propietario},
+        {
+            "$set": {
+                "ultima_cedula": ultima_cedula,
+                "lease_hasta": datetime.now() + DURACION_LEASE,
+                "actualizado_en": datetime.now()
+            },
+            "$inc": {"procesados": procesados},
+            "$addToSet": {"fallidas": {"$each": list(fallidas)}}
+        }
+    )
+    if resultado.matched_count == 0:
+        raise RuntimeError(f"Se perdió el lease del shard {shard['_id']}")
+
+def registrar_recuperadas(db, shard, propietario, recuperadas):
+    resultado = db.vista360_shards.update_one(
+        {"_id": shard["_id"], "propietario": propietario},
+        {
+            "$set": {"lease_hasta": datetime.now() + DURACION_LEASE, "actualizado_en": datetime.now()},
+            "$pull": {"fallidas": {"$in": list(recuperadas)}}
+        }
+    )
+    if resultado.matched_count == 0:
+        raise RuntimeError(f"Se perdió el lease del shard {shard['_id']}")
+
+def completar_shard(db, shard, propietario):
+    db.vista360_shards.update_one(
+        {"_id": shard["_id"], "propietario": propietario},
+        {"$set": {"estado": "completado", "lease_hasta": None, "actualizado_en": datetime.now()}}
+    )
+
+# ─── PROCESAR UN SHARD ────────────────────────────────────────
+def lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+def procesar_shard(shard, propietario, motor, concurrencia):
+    db = agente.db
+    escritor = agente.EscritorVista360(
+        db.vista360, upsert=True, estadisticas=EstadisticasVista360(db.vista360_stats),
+        cola=ColaAsesor(db.cola_asesor)
+    )
+    ultima_cedula = shard["ultima_cedula"]
+    while True:
+        cedulas = agente.iterar_cedulas(desde=ultima_cedula, hasta=shard["hasta"])
+        try:
+            for lote in lotes(cedulas, TAMANO_LOTE_SHARD):
+                fallidas = []
+                procesados = agente.procesar_perfiles(
+                    agente.consolidar_perfiles_lote(lote),
+                    escritor, motor, concurrencia, fallidos=fallidas
+                )
+                # procesar_perfiles ya vació el escritor: el lote está en vista360,
+                # y las fallidas quedan en el shard junto con el checkpoint
+                registrar_avance(db, shard, propietario, lote[-1], procesados, fallidas)
+                ultima_cedula = lote[-1]
+            break
+        except CursorNotFound:
+            # El cursor venció mientras se analizaba un lote: se retoma
+            print(f"⚠️ Cursor vencido en {shard['_id']}, se retoma desde {ultima_cedula}")
+    reintentar_fallidas(db, shard, propietario, escritor, motor, concurrencia)
+    completar_shard(db, shard, propietario)
+
+# Un reintento por ejecución; las que vuelven a fallar siguen en el shard
+# para la próxima vez que se retome el trabajo.
+def reintentar_fallidas(db, shard, propietario, escritor, motor, concurrencia):
+    fallidas = db.vista360_shards.find_one({"_id": shard["_id"]}, {"fallidas": 1}).get("fallidas") or []
+    if not fallidas:
+        return
+    print(f"🔁 {shard['_id']}: reintentando {len(fallidas)} clientes con análisis fallido")
+    for lote in lotes(fallidas, TAMANO_LOTE_SHARD):
+        siguen_fallando = []
+        agente.procesar_perfiles(
+            agente.consolidar_perfiles_lote(lote),
+            escritor, motor, concurrencia, fallidos=siguen_fallando
+        )
+        registrar_recuperadas(db, shard, propietario, set(lote) - set(siguen_fallando))
+
+# ─── WORKER ───────────────────────────────────────────────────
+# 0 es "sin límite": con más workers que el límite cada uno queda en 1, no
+# en 0, para no apagar el limitador.
+def repartir_limite(limite, workers_locales):
+    return max(1, limite // workers_locales) if limite else 0
+
+def trabajador(trabajo, workers_locales=1, concurrencia=GEMINI_CONCURRENCIA):
+    propietario = f"{socket.gethostname()}:{os.getpid()}"
+    # Los límites de Gemini se reparten entre los procesos de esta máquina
+    limitador = LimitadorTasa(repartir_limite(GEMINI_RPM, workers_locales),
+                              repartir_limite(GEMINI_TPM, workers_locales))
+    motor = agente.MotorAnalisis(limitador=limitador)
+    shards_procesados = 0
+    while (shard := tomar_shard(agente.db, trabajo, propietario)) is not None:
+        print(f"🧩 {propietario} toma {shard['_id']} (desde {shard['ultima_cedula'] or 'el inicio'})")
+        procesar_shard(shard, propietario, motor, concurrencia)
+        shards_procesados += 1
+    print(f"   {propietario}: {shards_procesados} shards · {motor.cache.resumen()}")
+    # Un reporte por proceso: las etapas se comparan entre workers
+    print(f"   Reporte: {instrumentos.guardar_reporte(prefijo=f'{trabajo}_{socket.gethostname()}')}")
+    return shards_procesados
+
+def ejecutar_trabajo(trabajo, num_shards, workers):
+    preparar_trabajo(agente.db, trabajo, num_shards)
+    # spawn: cada proceso crea su propio MongoClient en el primer uso
+    # (conexion.obtener_cliente lo guarda por pid)
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Pool(workers) as pool:
+        pool.starmap(trabajador, [(trabajo, workers)] * workers)
+
+def estado_trabajo(db, trabajo):
+    return list(db.vista360_shards.find({"trabajo": trabajo}).sort("shard", 1))
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ejecución por shards del motor VISTA 360")
+    parser.add_argument("--trabajo", required=True, help="identificador del trabajo (reusar para retomar)")
+    parser.add_argument("--shards", type=int, default=16, help="número de shards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="procesos en esta máquina")
+    args = parser.parse_args()
+
+    print(f"🚀 Trabajo {args.trabajo}: {args.shards} shards · {args.workers} workers")
+    ejecutar_trabajo(args.trabajo, args.shards, args.workers)
+
+    shards = estado_trabajo(agente.db, args.trabajo)
+    completados = sum(1 for s in shards if s["estado"] == "completado")
+    fallidas = sum(len(s.get("fallidas") or []) for s in shards)
+    print(f"\n✅ {completados}/{len(shards)} shards completados · "
+          f"{sum(s['procesados'] for s in shards)} clientes procesados")
+    if fallidas:
+        print(f"⚠️ {fallidas} clientes con el resumen por reglas tras fallar su análisis; "
+              f"se reintentan al volver a ejecutar --trabajo {args.trabajo}")
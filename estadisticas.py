@@ -0,0 +1,119 @@
+from collections import Counter
+from datetime import datetime
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+ID_ESTADISTICAS = "resumen"
+# Sumas de cartera y mapas que vienen de los agregados de cada cliente
+SUMAS_CARTERA = ["valor_asegurado", "prima_mensual", "polizas_vigentes"]
+MAPAS_CARTERA = ["renovaciones_por_semana", "pipeline_por_estado", "pipeline_por_asesor"]
+
+# MongoDB no admite "." ni "$" inicial en nombres de campo
+def clave(texto):
+    return str(texto or "Sin dato").replace(".", "·").lstrip("$")
+
+# ─── APORTE DE UN CLIENTE AL RESUMEN ──────────────────────────
+def aporte(documento):
+    fuentes = documento.get("fuentes", [])
+    contador = Counter({
+        "total": 1,
+        "multi_fuente": int(len(fuentes) > 1),
+        "tres_fuentes": int(len(fuentes) == 3),
+        f"por_ciudad.{clave(documento.get('ciudad', ''))}": 1
+    })
+    for fuente in fuentes:
+        contador[f"por_fuente.{clave(fuente)}"] += 1
+    agregados = documento.get("agregados") or {}
+    for campo in SUMAS_CARTERA:
+        contador[campo] += agregados.get(campo, 0)
+    for mapa in MAPAS_CARTERA:
+        for nombre, valor in agregados.get(mapa, {}).items():
+            contador[f"{mapa}.{nombre}"] += valor
+    return contador
+
+# ─── ESTADÍSTICAS INCREMENTALES ───────────────────────────────
+# Acumula el cambio que produce cada documento escrito (restando el aporte
+# del documento anterior en los upserts) y lo aplica con un solo $inc, así
+# vista360_stats se mantiene sin volver a recorrer vista360.
+class EstadisticasVista360:
+    def __init__(self, coleccion):
+        self.coleccion = coleccion
+        self.delta = Counter()
+
+    def registrar(self, documento, anterior=None):
+        self.delta.update(aporte(documento))
+        if anterior:
+            self.delta.subtract(aporte(anterior))
+
+    def aplicar(self):
+        cambios = {k: v for k, v in self.delta.items() if v}
+        if cambios:
+            self.coleccion.update_one(
+                {"_id": ID_ESTADISTICAS},
+                {"$inc": cambios, "$set": {"actualizado_en": datetime.now()}},
+                upsert=True
+            )
+        self.delta = Counter()
+
+    def reemplazar(self):
+        # Tras una reconstrucción completa el acumulado es el resumen entero
+        resumen = {"total": 0, "multi_fuente": 0, "tres_fuentes": 0, "por_ciudad": {}, "por_fuente": {}}
+        resumen.update({campo: 0 for campo in SUMAS_CARTERA})
+        resumen.update({mapa: {} for mapa in MAPAS_CARTERA})
+        for ruta, valor in self.delta.items():
+            if "." in ruta:
+                grupo, nombre = ruta.split(".", 1)
+                if valor:
+                    resumen[grupo][nombre] = valor
+            else:
+                resumen[ruta] = valor
+        resumen["actualizado_en"] = datetime.now()
+        self.coleccion.replace_one({"_id": ID_ESTADISTICAS}, resumen, upsert=True)
+        self.delta = Counter()
+
+# ─── CÁLCULO CON $facet ───────────────────────────────────────
+# Respaldo cuando no existe el documento de resumen: una sola agregación.
+def _faceta_mapa(mapa):
+    return [
+        {"$project": {"par": {"$objectToArray": {"$ifNull": [f"$agregados.{mapa}", {}]}}}},
+        {"$unwind": "$par"},
+        {"$group": {"_id": "$par.k", "n": {"$sum": "$par.v"}}}
+    ]
+
+def calcular_estadisticas(coleccion):
+    pipeline = [
+        {"$project": {
+            "ciudad": {"$ifNull": ["$ciudad", ""]},
+            "fuentes": {"$ifNull": ["$fuentes", []]},
+            "num_fuentes": {"$size": {"$ifNull": ["$fuentes", []]}},
+            "agregados": 1
+        }},
+        {"$facet": {
+            "totales": [{"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "multi_fuente": {"$sum": {"$cond": [{"$gt": ["$num_fuentes", 1]}, 1, 0]}},
+                "tres_fuentes": {"$sum": {"$cond": [{"$eq": ["$num_fuentes", 3]}, 1, 0]}},
+                **{campo: {"$sum": f"$agregados.{campo}"} for campo in SUMAS_CARTERA}
+            }}],
+            "por_ciudad": [{"$group": {"_id": "$ciudad", "n": {"$sum": 1}}}],
+            "por_fuente": [{"$unwind": "$fuentes"}, {"$group": {"_id": "$fuentes", "n": {"$sum": 1}}}],
+            **{mapa: _faceta_mapa(mapa) for mapa in MAPAS_CARTERA}
+        }}
+    ]
+    resultado = next(coleccion.aggregate(pipeline))
+    totales = resultado["totales"][0] if resultado["totales"] else {}
+    return {
+        "total": totales.get("total", 0),
+        "multi_fuente": totales.get("multi_fuente", 0),
+        "tres_fuentes": totales.get("tres_fuentes", 0),
+        "por_ciudad": {clave(g["_id"]): g["n"] for g in resultado["por_ciudad"]},
+        "por_fuente": {clave(g["_id"]): g["n"] for g in resultado["por_fuente"]},
+        **{campo: totales.get(campo, 0) for campo in SUMAS_CARTERA},
+        **{mapa: {g["_id"]: g["n"] for g in resultado[mapa] if g["n"]} for mapa in MAPAS_CARTERA}
+    }
+
+def leer_estadisticas(db):
+    resumen = db.vista360_stats.find_one({"_id": ID_ESTADISTICAS})
+    if resumen is None:
+        resumen = calcular_estadisticas(db.vista360)
+    return resumen
@@ -1,15 +1,19 @@
 from faker import Faker
-from pymongo import MongoClient
 from datetime import datetime, timedelta
+from multiprocessing import Pool
+import argparse
+import json
 import random
 import os
 from dotenv import load_dotenv
 
+from conexion import Diferido, obtener_db
+
 load_dotenv()
 fake = Faker('es_CO')
 
-client = MongoClient(os.getenv("MONGODB_URI"))
-db = client[os.getenv("DATABASE_NAME")]
+# La conexión se abre al primer uso de `db`
+db = Diferido(obtener_db)
 
 # ─── DATOS BASE ───────────────────────────────────────────────
 PRODUCTOS_CENTRA = ["Vida Individual", "Vida Grupo", "Accidentes Personales", "Salud"]
@@ -18,34 +22,35 @@ ESTADOS_LEAD = ["Nuevo", "En gestión", "Cotizado", "Cerrado ganado", "Cerrado p
 ASESORES = ["Carlos Martínez", "Laura Gómez", "Andrés Pérez", "María López", "Felipe Torres"]
 CIUDADES = ["Bogotá", "Medellín", "Cali", "Barranquilla", "Bucaramanga"]
 
-def generar_cedula():
-    return str(random.randint(10000000, 1099999999))
+def generar_cedula(rnd=random):
+    return str(rnd.randint(10000000, 1099999999))
 
-def generar_fecha_pasada(dias=365):
-    return datetime.now() - timedelta(days=random.randint(1, dias))
+# Las fechas se calculan desde `referencia`; sin ella, desde ahora
+def generar_fecha_pasada(dias=365, rnd=random, referencia=None):
+    return (referencia or datetime.now()) - timedelta(days=rnd.randint(1, dias))
 
-def generar_fecha_futura(dias=365):
-    return datetime.now() + timedelta(days=random.randint(30, dias))
+def generar_fecha_futura(dias=365, rnd=random, referencia=None):
+    return (referencia or datetime.now()) + timedelta(days=rnd.randint(30, dias))
 
 # ─── CLIENTES BASE (pool compartido) ──────────────────────────
-def generar_clientes_base(n=50):
+def generar_clientes_base(n=50, rnd=random, faker=fake, cedulas=None):
     clientes = []
-    for _ in range(n):
+    for i in range(n):
         clientes.append({
-            "cedula": generar_cedula(),
-            "nombre": fake.name(),
-            "email": fake.email(),
-            "telefono": fake.phone_number(),
-            "ciudad": random.choice(CIUDADES)
+            "cedula": cedulas[i] if cedulas else generar_cedula(rnd),
+            "nombre": faker.name(),
+            "email": faker.email(),
+            "telefono": faker.phone_number(),
+            "ciudad": rnd.choice(CIUDADES)
         })
     return clientes
 
 # ─── CENTRA ───────────────────────────────────────────────────
-def generar_centra(clientes):
-    db.centra.drop()
+def registros_centra(clientes, rnd=random, referencia=None):
+    referencia = referencia or datetime.now()
     registros = []
     for c in clientes:
-        if random.random() > 0.3:
+        if rnd.random() > 0.3:
             registros.append({
                 "fuente": "CENTRA",
                 "cedula_cliente": c["cedula"],
@@ -53,25 +58,30 @@ def generar_centra(clientes):
                 "email": c["email"],
                 "telefono": c["telefono"],
                 "ciudad": c["ciudad"],
-                "producto": random.choice(PRODUCTOS_CENTRA),
-                "estado_poliza": random.choice(["Activa", "Vencida", "Suspendida"]),
-                "fecha_inicio": generar_fecha_pasada(730),
-                "fecha_vencimiento": generar_fecha_futura(365),
-                "prima_mensual": round(random.uniform(50000, 500000), 0),
-                "asesor": random.choice(ASESORES),
-                "ultima_gestion": generar_fecha_pasada(90),
+                "producto": rnd.choice(PRODUCTOS_CENTRA),
+                "estado_poliza": rnd.choice(["Activa", "Vencida", "Suspendida"]),
+                "fecha_inicio": generar_fecha_pasada(730, rnd, referencia),
+                "fecha_vencimiento": generar_fecha_futura(365, rnd, referencia),
+                "prima_mensual": round(rnd.uniform(50000, 500000), 0),
+                "asesor": rnd.choice(ASESORES),
+                "ultima_gestion": generar_fecha_pasada(90, rnd, referencia),
                 "created_at": datetime.now()
             })
+    return registros
+
+def generar_centra(clientes):
+    db.centra.drop()
+    registros = registros_centra(clientes)
     db.centra.insert_many(registros)
     print(f"✅ CENTRA: {len(registros)} registros insertados")
 
 # ─── FLOW 360 ─────────────────────────────────────────────────
-def generar_flow360(clientes):
-    db.flow360.drop()
+def registros_flow360(clientes, rnd=random, referencia=None):
+    referencia = referencia or datetime.now()
     registros = []
     for c in clientes:
-        if random.random() > 0.4:
-            num_polizas = random.randint(1, 3)
+        if rnd.random() > 0.4:
+            num_polizas = rnd.randint(1, 3)
             for _ in range(num_polizas):
                 registros.append({
                     "fuente": "FLOW360",
@@ -80,25 +90,30 @@ def generar_flow360(clientes):
                     "correo": c["email"],
                     "celular": c["telefono"],
                     "municipio": c["ciudad"],
-                    "ramo": random.choice(PRODUCTOS_FLOW360),
-                    "numero_poliza": f"POL-{random.randint(100000, 999999)}",
-                    "estado": random.choice(["Vigente", "Por vencer", "Cancelada"]),
-                    "valor_asegurado": round(random.uniform(5000000, 500000000), 0),
-                    "fecha_expedicion": generar_fecha_pasada(500),
-                    "fecha_renovacion": generar_fecha_futura(180),
-                    "ejecutivo": random.choice(ASESORES),
-                    "ultimo_contacto": generar_fecha_pasada(60),
+                    "ramo": rnd.choice(PRODUCTOS_FLOW360),
+                    "numero_poliza": f"POL-{rnd.randint(100000, 999999)}",
+                    "estado": rnd.choice(["Vigente", "Por vencer", "Cancelada"]),
+                    "valor_asegurado": round(rnd.uniform(5000000, 500000000), 0),
+                    "fecha_expedicion": generar_fecha_pasada(500, rnd, referencia),
+                    "fecha_renovacion": generar_fecha_futura(180, rnd, referencia),
+                    "ejecutivo": rnd.choice(ASESORES),
+                    "ultimo_contacto": generar_fecha_pasada(60, rnd, referencia),
                     "created_at": datetime.now()
                 })
+    return registros
+
+def generar_flow360(clientes):
+    db.flow360.drop()
+    registros = registros_flow360(clientes)
     db.flow360.insert_many(registros)
     print(f"✅ FLOW360: {len(registros)} registros insertados")
 
 # ─── GESTOR DE LEADS ──────────────────────────────────────────
-def generar_gestor_leads(clientes):
-    db.gestor_leads.drop()
+def registros_gestor_leads(clientes, rnd=random, faker=fake, referencia=None):
+    referencia = referencia or datetime.now()
     registros = []
     for c in clientes:
-        if random.random() > 0.5:
+        if rnd.random() > 0.5:
             registros.append({
                 "fuente": "GESTOR_LEADS",
                 "documento": c["cedula"],
@@ -106,25 +121,153 @@ def generar_gestor_leads(clientes):
                 "email_contacto": c["email"],
                 "telefono_contacto": c["telefono"],
                 "ciudad_interes": c["ciudad"],
-                "producto_interes": random.choice(PRODUCTOS_CENTRA + PRODUCTOS_FLOW360),
-                "estado_lead": random.choice(ESTADOS_LEAD),
-                "probabilidad_cierre": random.randint(10, 95),
-                "valor_estimado": round(random.uniform(100000, 2000000), 0),
-                "asesor_asignado": random.choice(ASESORES),
-                "fecha_creacion": generar_fecha_pasada(180),
-                "fecha_ultimo_seguimiento": generar_fecha_pasada(30),
-                "observaciones": fake.text(max_nb_chars=100),
+                "producto_interes": rnd.choice(PRODUCTOS_CENTRA + PRODUCTOS_FLOW360),
+                "estado_lead": rnd.choice(ESTADOS_LEAD),
+                "probabilidad_cierre": rnd.randint(10, 95),
+                "valor_estimado": round(rnd.uniform(100000, 2000000), 0),
+                "asesor_asignado": rnd.choice(ASESORES),
+                "fecha_creacion": generar_fecha_pasada(180, rnd, referencia),
+                "fecha_ultimo_seguimiento": generar_fecha_pasada(30, rnd, referencia),
+                "observaciones": faker.text(max_nb_chars=100),
                 "created_at": datetime.now()
             })
+    return registros
+
+def generar_gestor_leads(clientes):
+    db.gestor_leads.drop()
+    registros = registros_gestor_leads(clientes)
     db.gestor_leads.insert_many(registros)
     print(f"✅ GESTOR LEADS: {len(registros)} registros insertados")
 
+# ─── GENERACIÓN MASIVA POR LOTES ──────────────────────────────
+# Cada lote se genera con su propia semilla (semilla base + número de lote),
+# así el resultado no depende del número de workers ni del orden en que
+# terminen. Las cédulas salen de una permutación del índice global del
+# cliente, de modo que son únicas aun con millones de clientes. Las fechas
+# se anclan a `referencia` (por defecto hoy a medianoche): la misma semilla
+# y la misma fecha de referencia reproducen los mismos datos. created_at
+# es la hora real de generación: el refresco incremental lo compara con su
+# marca de agua (no entra en la huella de la caché ni en el prompt).
+RANGO_CEDULAS = 1099999999 - 10000000
+MULTIPLICADOR_CEDULAS = 7919  # primo con RANGO_CEDULAS
+
+def cedula_para_indice(indice):
+    return str(10000000 + (indice * MULTIPLICADOR_CEDULAS) % RANGO_CEDULAS)
+
+def fecha_referencia(texto=None):
+    if texto:
+        return datetime.strptime(texto, "%Y-%m-%d")
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def generar_lote(numero_lote, tamano_lote, num_clientes, semilla, referencia=None):
+    referencia = referencia or fecha_referencia()
+    rnd = random.Random(semilla * 1000003 + numero_lote)
+    faker = Faker('es_CO')
+    faker.seed_instance(semilla * 1000003 + numero_lote)
+
+    desde = numero_lote * tamano_lote
+    hasta = min(desde + tamano_lote, num_clientes)
+    clientes = generar_clientes_base(
+        hasta - desde, rnd, faker,
+        cedulas=[cedula_para_indice(i) for i in range(desde, hasta)]
+    )
+    return {
+        "centra": registros_centra(clientes, rnd, referencia),
+        "flow360": registros_flow360(clientes, rnd, referencia),
+        "gestor_leads": registros_gestor_leads(clientes, rnd, faker, referencia)
+    }
+
+def _fecha_iso(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor)}")
+
+def escribir_jsonl(ruta, registros):
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        for r in registros:
+            archivo.write(json.dumps(r, ensure_ascii=False, default=_fecha_iso) + "\n")
+
+def escribir_parquet(ruta, registros):
+    import pandas as pd  # requiere pyarrow o fastparquet
+    pd.DataFrame(registros).to_parquet(ruta, index=False)
+
+# Estado de cada proceso worker: conexión propia (MongoClient no se
+# comparte entre procesos) y parámetros de la corrida.
+_worker = {}
+
+def _iniciar_worker(parametros):
+    _worker.update(parametros)
+    if parametros["salida"] == "mongo":
+        _worker["db"] = obtener_db(parametros["database"], parametros["uri"])
+
+def _procesar_lote(numero_lote):
+    lote = generar_lote(
+        numero_lote, _worker["tamano_lote"], _worker["num_clientes"], _worker["semilla"], _worker["referencia"]
+    )
+    for coleccion, registros in lote.items():
+        if not registros:
+            continue
+        if _worker["salida"] == "mongo":
+            _worker["db"][coleccion].insert_many(registros, ordered=False)
+        else:
+            ruta = os.path.join(_worker["directorio"], f"{coleccion}-{numero_lote:06d}.{_worker['salida']}")
+            (escribir_jsonl if _worker["salida"] == "jsonl" else escribir_parquet)(ruta, registros)
+    return {coleccion: len(registros) for coleccion, registros in lote.items()}
+
+def generar_masivo(num_clientes, tamano_lote=10000, workers=None, semilla=42,
+                   salida="mongo", directorio="fixtures", referencia=None):
+    if salida == "mongo":
+        for coleccion in ("centra", "flow360", "gestor_leads"):
+            db[coleccion].drop()
+    else:
+        os.makedirs(directorio, exist_ok=True)
+
+    parametros = {
+        "num_clientes": num_clientes,
+        "tamano_lote": tamano_lote,
+        "semilla": semilla,
+        "referencia": referencia or fecha_referencia(),
+        "salida": salida,
+        "directorio": directorio,
+        "uri": os.getenv("MONGODB_URI"),
+        # Del entorno y no de `db`: con jsonl/parquet no se crea ningún cliente
+        "database": os.getenv("DATABASE_NAME")
+    }
+    num_lotes = -(-num_clientes // tamano_lote)
+    totales = {"centra": 0, "flow360": 0, "gestor_leads": 0}
+    # imap_unordered mantiene en memoria a lo sumo un lote por worker
+    with Pool(workers, initializer=_iniciar_worker, initargs=(parametros,)) as pool:
+        for i, conteo in enumerate(pool.imap_unordered(_procesar_lote, range(num_lotes)), 1):
+            for coleccion, n in conteo.items():
+                totales[coleccion] += n
+            print(f"   📦 Lote {i}/{num_lotes} · {min(i * tamano_lote, num_clientes):,} clientes")
+    return totales
+
 # ─── EJECUTAR ─────────────────────────────────────────────────
 if __name__ == "__main__":
-    print("🚀 Generando datos sintéticos para VISTA 360...")
-    clientes_base = generar_clientes_base(50)
-    generar_centra(clientes_base)
-    generar_flow360(clientes_base)
-    generar_gestor_leads(clientes_base)
-    print("\n✅ Base de datos lista en MongoDB Atlas")
-    print(f"   Colecciones creadas: centra, flow360, gestor_leads")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos para VISTA 360")
+    parser.add_argument("--clients", type=int, default=50, help="número de clientes base")
+    parser.add_argument("--batch-size", type=int, default=10000, help="clientes por lote")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="procesos generadores")
+    parser.add_argument("--seed", type=int, default=42, help="semilla para reproducibilidad")
+    parser.add_argument("--output", choices=["mongo", "jsonl", "parquet"], default="mongo",
+                        help="destino: MongoDB o archivos de fixtures")
+    parser.add_argument("--output-dir", default="fixtures", help="directorio para jsonl/parquet")
+    parser.add_argument("--reference-date", default=None, metavar="AAAA-MM-DD",
+                        help="fecha desde la que se calculan las fechas (por defecto hoy)")
+    args = parser.parse_args()
+
+    referencia = fecha_referencia(args.reference_date)
+    print(f"🚀 Generando datos sintéticos para VISTA 360 ({args.clients:,} clientes, "
+          f"semilla {args.seed}, referencia {referencia:%Y-%m-%d})...")
+    totales = generar_masivo(
+        args.clients, args.batch_size, args.workers, args.seed, args.output, args.output_dir, referencia
+    )
+    print(f"✅ CENTRA: {totales['centra']:,} registros")
+    print(f"✅ FLOW360: {totales['flow360']:,} registros")
+    print(f"✅ GESTOR LEADS: {totales['gestor_leads']:,} registros")
+    if args.output == "mongo":
+        print("\n✅ Base de datos lista en MongoDB")
+        print(f"   Colecciones creadas: centra, flow360, gestor_leads")
+    else:
+        print(f"\n✅ Fixtures escritos en {args.output_dir}/")
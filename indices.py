@@ -0,0 +1,122 @@
+from datetime import datetime
+
+from pymongo import ASCENDING, IndexModel
+
+from busqueda import filtro_busqueda, orden_busqueda
+from cola_asesor import CAMPOS_COLA
+from refresco_incremental import COLECCIONES_FUENTE
+
+# ─── ÍNDICES ──────────────────────────────────────────────────
+# Los compuestos (fecha, cédula) cubren las consultas por marca de agua
+# del refresco incremental, que solo proyectan la cédula.
+INDICES = {
+    "centra": [
+        IndexModel([("cedula_cliente", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING), ("cedula_cliente", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING), ("cedula_cliente", ASCENDING)])
+    ],
+    "flow360": [
+        IndexModel([("identificacion", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING), ("identificacion", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING), ("identificacion", ASCENDING)])
+    ],
+    "gestor_leads": [
+        IndexModel([("documento", ASCENDING)]),
+        IndexModel([("created_at", ASCENDING), ("documento", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING), ("documento", ASCENDING)])
+    ],
+    "vista360": [
+        IndexModel([("cedula", ASCENDING)], unique=True),
+        IndexModel([("nombre_normalizado", ASCENDING), ("cedula", ASCENDING)]),
+        IndexModel([("terminos_busqueda", ASCENDING)])
+    ],
+    # Igualdad por asesor, orden por prioridad y fecha, y los campos que se
+    # muestran al final para que la cola sea una consulta cubierta
+    "cola_asesor": [
+        IndexModel([
+            ("asesor", ASCENDING), ("prioridad_orden", ASCENDING), ("proxima_fecha", ASCENDING),
+            ("cedula", ASCENDING), ("nombre", ASCENDING), ("motivo", ASCENDING)
+        ]),
+        IndexModel([("cedula", ASCENDING)])
+    ]
+}
+
+def crear_indices(db, colecciones=None):
+    for coleccion in colecciones or INDICES:
+        db[coleccion].create_indexes(INDICES[coleccion])
+
+# ─── CONSULTAS CRÍTICAS ───────────────────────────────────────
+# (colección, filtro, proyección, orden, índice sugerido) de las consultas
+# que hacen el agente y el dashboard.
+CEDULA_EJEMPLO = "1000000000"
+FECHA_EJEMPLO = datetime(2024, 1, 1)
+CAMPOS_LISTA = {"_id": 0, "cedula": 1, "nombre": 1, "nombre_normalizado": 1, "ciudad": 1, "fuentes": 1}
+
+CONSULTAS_CRITICAS = [
+    ("centra", {"cedula_cliente": CEDULA_EJEMPLO}, None, None, None),
+    ("flow360", {"identificacion": CEDULA_EJEMPLO}, None, None, None),
+    ("gestor_leads", {"documento": CEDULA_EJEMPLO}, None, None, None),
+    ("centra", {"cedula_cliente": {"$in": [CEDULA_EJEMPLO]}}, None, None, None),
+    ("flow360", {"identificacion": {"$in": [CEDULA_EJEMPLO]}}, None, None, None),
+    ("gestor_leads", {"documento": {"$in": [CEDULA_EJEMPLO]}}, None, None, None),
+    ("centra", {}, {"_id": 0, "cedula_cliente": 1}, [("cedula_cliente", ASCENDING)], None),
+    ("flow360", {}, {"_id": 0, "identificacion": 1}, [("identificacion", ASCENDING)], None),
+    ("gestor_leads", {}, {"_id": 0, "documento": 1}, [("documento", ASCENDING)], None),
+    *[
+        (coleccion, {"$or": [{"created_at": {"$gt": FECHA_EJEMPLO}}, {"updated_at": {"$gt": FECHA_EJEMPLO}}]},
+         {"_id": 0, campo: 1}, None, None)
+        for coleccion, campo in COLECCIONES_FUENTE.items()
+    ],
+    ("vista360", {"cedula": CEDULA_EJEMPLO}, None, None, None),
+    *[
+        ("vista360", filtro_busqueda(texto), CAMPOS_LISTA, orden_busqueda(texto), None)
+        for texto in ("1", "100", "eduardo", "")
+    ],
+    ("cola_asesor", {"asesor": "Laura Gómez"}, CAMPOS_COLA,
+     [("prioridad_orden", ASCENDING), ("proxima_fecha", ASCENDING)], None)
+]
+
+# ─── VERIFICACIÓN DE PLANES ───────────────────────────────────
+def etapas_plan(plan):
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for valor in plan.values():
+            yield from etapas_plan(valor)
+    elif isinstance(plan, list):
+        for valor in plan:
+            yield from etapas_plan(valor)
+
+def verificar_planes(db, consultas=CONSULTAS_CRITICAS):
+    fallidas = []
+    for coleccion, filtro, proyeccion, orden, indice in consultas:
+        cursor = db[coleccion].find(filtro, proyeccion)
+        if not hasattr(cursor, "explain"):
+            print("⚠️ El servidor no soporta explain() (mongomock): solo se crearon los índices")
+            return
+        if orden:
+            cursor = cursor.sort(orden)
+        if indice:
+            cursor = cursor.hint(indice)
+        etapas = set(etapas_plan(cursor.explain()["queryPlanner"]["winningPlan"]))
+        cubierta = "FETCH" not in etapas
+        estado = "❌ COLLSCAN" if "COLLSCAN" in etapas else "✅ cubierta" if cubierta else "✅ índice"
+        print(f"   {estado:<12} {coleccion}.find({filtro})")
+        if "COLLSCAN" in etapas:
+            fallidas.append(f"{coleccion}.find({filtro})")
+    if fallidas:
+        raise RuntimeError("Consultas con COLLSCAN: " + "; ".join(fallidas))
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    from conexion import obtener_db
+    db = obtener_db()
+
+    print("🗂️ Creando índices...")
+    crear_indices(db)
+    for coleccion in INDICES:
+        print(f"   {coleccion}: {', '.join(db[coleccion].index_information())}")
+
+    print("\n🔎 Verificando planes de consulta...")
+    verificar_planes(db)
+    print("\n✅ Ninguna consulta crítica usa COLLSCAN")
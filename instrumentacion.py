@@ -0,0 +1,158 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import bson
+from pymongo import monitoring
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+DIRECTORIO_REPORTES = os.environ.get("VISTA360_REPORTES", "reportes")
+# Medir bytes obliga a re-codificar cada comando y respuesta en BSON
+MEDIR_BYTES_MONGO = os.environ.get("VISTA360_MEDIR_BYTES", "0") == "1"
+MUESTRAS_POR_ETAPA = 10000
+
+# ─── ESTADÍSTICAS DE UNA ETAPA ────────────────────────────────
+# Conteo, total y máximo exactos; los percentiles salen de una muestra
+# de reservorio acotada, así la memoria no crece con el número de llamadas.
+class EstadisticaEtapa:
+    def __init__(self, muestras_max=MUESTRAS_POR_ETAPA):
+        self.conteo = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.muestras = []
+        self.muestras_max = muestras_max
+        self._random = random.Random(0)
+
+    def agregar(self, duracion):
+        self.conteo += 1
+        self.total += duracion
+        self.maximo = max(self.maximo, duracion)
+        if len(self.muestras) < self.muestras_max:
+            self.muestras.append(duracion)
+        else:
+            i = self._random.randrange(self.conteo)
+            if i < self.muestras_max:
+                self.muestras[i] = duracion
+
+    def percentil(self, p):
+        if not self.muestras:
+            return 0.0
+        ordenadas = sorted(self.muestras)
+        return ordenadas[min(len(ordenadas) - 1, int(p / 100 * len(ordenadas)))]
+
+    def resumen(self):
+        return {
+            "conteo": self.conteo,
+            "total_s": round(self.total, 4),
+            "p50_ms": round(self.percentil(50) * 1000, 3),
+            "p95_ms": round(self.percentil(95) * 1000, 3),
+            "p99_ms": round(self.percentil(99) * 1000, 3),
+            "max_ms": round(self.maximo * 1000, 3)
+        }
+
+# ─── INSTRUMENTACIÓN ──────────────────────────────────────────
+class Instrumentacion:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.etapas = {}
+            self.contadores = Counter()
+            self.inicio = datetime.now()
+
+    @contextmanager
+    def etapa(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tiempo(nombre, time.perf_counter() - inicio)
+
+    def medir(self, nombre):
+        def decorador(funcion):
+            @wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.etapa(nombre):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def registrar_tiempo(self, nombre, duracion):
+        with self._lock:
+            if nombre not in self.etapas:
+                self.etapas[nombre] = EstadisticaEtapa()
+            self.etapas[nombre].agregar(duracion)
+
+    def contar(self, nombre, n=1):
+        with self._lock:
+            self.contadores[nombre] += n
+
+    def registrar_tokens(self, respuesta):
+        uso = getattr(respuesta, "usage_metadata", None)
+        if uso is not None:
+            self.contar("gemini.tokens_entrada", getattr(uso, "prompt_token_count", 0) or 0)
+            self.contar("gemini.tokens_salida", getattr(uso, "candidates_token_count", 0) or 0)
+
+    def reporte(self):
+        with self._lock:
+            return {
+                "inicio": self.inicio.isoformat(),
+                "fin": datetime.now().isoformat(),
+                "etapas": {nombre: e.resumen() for nombre, e in sorted(self.etapas.items())},
+                "contadores": dict(sorted(self.contadores.items()))
+            }
+
+    def tabla(self):
+        reporte = self.reporte()
+        lineas = [
+            f"{'etapa':<32}{'n':>9}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+            "─" * 81
+        ]
+        for nombre, e in reporte["etapas"].items():
+            lineas.append(
+                f"{nombre:<32}{e['conteo']:>9}{e['total_s']:>10.2f}"
+                f"{e['p50_ms']:>10.2f}{e['p95_ms']:>10.2f}{e['p99_ms']:>10.2f}"
+            )
+        if reporte["contadores"]:
+            lineas.append("")
+            lineas.extend(f"{nombre:<32}{valor:>12,}" for nombre, valor in reporte["contadores"].items())
+        return "\n".join(lineas)
+
+    def guardar_reporte(self, directorio=DIRECTORIO_REPORTES, prefijo="vista360"):
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f"{prefijo}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.json")
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            json.dump(self.reporte(), archivo, ensure_ascii=False, indent=2)
+        return ruta
+
+# ─── ESCUCHA DE COMANDOS MONGODB ──────────────────────────────
+# Se pasa a MongoClient(event_listeners=[...]): cuenta consultas y mide la
+# latencia de cada comando (y, si se pide, los bytes enviados/recibidos).
+class EscuchaMongo(monitoring.CommandListener):
+    def __init__(self, instrumentos, medir_bytes=MEDIR_BYTES_MONGO):
+        self.instrumentos = instrumentos
+        self.medir_bytes = medir_bytes
+
+    def started(self, event):
+        self.instrumentos.contar(f"mongo.{event.command_name}.consultas")
+        if self.medir_bytes:
+            self.instrumentos.contar("mongo.bytes_enviados", len(bson.encode(event.command)))
+
+    def succeeded(self, event):
+        self.instrumentos.registrar_tiempo(f"mongo.{event.command_name}", event.duration_micros / 1e6)
+        if self.medir_bytes:
+            self.instrumentos.contar("mongo.bytes_recibidos", len(bson.encode(event.reply)))
+
+    def failed(self, event):
+        self.instrumentos.contar(f"mongo.{event.command_name}.errores")
+
+# Instancia del proceso; cada worker de ejecucion_shards tiene la suya
+instrumentos = Instrumentacion()
@@ -0,0 +1,80 @@
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+# ─── MODELO FALSO PARA PRUEBAS SIN RED ────────────────────────
+# Imita la interfaz de genai.GenerativeModel: inyecta latencia y errores
+# 429/5xx para medir el pipeline de análisis sin llamar a Gemini. Ante un
+# prompt por lotes responde el arreglo JSON estructurado, omitiendo una
+# fracción de las entradas (tasa_omision) para ejercitar el reintento.
+PATRON_CEDULA = re.compile(r'"cliente":\{"cedula":"([^"]+)"')
+TOKENS_SALIDA_POR_CLIENTE = 150
+class ErrorModeloFalso(Exception):
+    def __init__(self, code):
+        super().__init__(f"Error simulado {code}")
+        self.code = code
+
+class ModeloFalso:
+    def __init__(self, latencia=0.5, variacion=0.2, tasa_error=0.0,
+                 codigos_error=(429, 503), semilla=None,
+                 latencia_por_cliente=0.0, tasa_omision=0.0):
+        self.latencia = latencia
+        self.variacion = variacion
+        self.tasa_error = tasa_error
+        self.codigos_error = codigos_error
+        self.latencia_por_cliente = latencia_por_cliente
+        self.tasa_omision = tasa_omision
+        self._random = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.errores = 0
+        self.tokens_entrada = 0
+        self.tokens_salida = 0
+
+    def _respuesta_lote(self, cedulas):
+        entradas = [
+            {
+                "cedula": cedula,
+                "resumen": "Cliente simulado",
+                "alertas": ["Póliza próxima a vencer"],
+                "oportunidades": ["Ofrecer Hogar"],
+                "accion_recomendada": "Llamar hoy",
+                "mensaje_sugerido": "Hola, le escribimos de Seguros Bolívar",
+                "prioridad": self._random.choice(["ALTA", "MEDIA", "BAJA"])
+            }
+            for cedula in cedulas
+            if self._random.random() >= self.tasa_omision
+        ]
+        return json.dumps(entradas, ensure_ascii=False)
+
+    def generate_content(self, prompt, **kwargs):
+        cedulas = PATRON_CEDULA.findall(prompt) if prompt.startswith("PERFILES CONSOLIDADOS") else []
+        clientes = max(1, len(cedulas))
+        with self._lock:
+            self.llamadas += 1
+            demora = max(0.0, self.latencia + self._random.uniform(-self.variacion, self.variacion))
+            demora += self.latencia_por_cliente * clientes
+            falla = self._random.random() < self.tasa_error
+            if falla:
+                self.errores += 1
+                codigo = self._random.choice(self.codigos_error)
+            else:
+                texto = (
+                    self._respuesta_lote(cedulas) if cedulas
+                    else f"Análisis simulado ({len(prompt)} caracteres de entrada)"
+                )
+                self.tokens_entrada += len(prompt) // 4
+                self.tokens_salida += TOKENS_SALIDA_POR_CLIENTE * clientes
+        time.sleep(demora)
+        if falla:
+            raise ErrorModeloFalso(codigo)
+        return SimpleNamespace(
+            text=texto,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=len(prompt) // 4,
+                candidates_token_count=TOKENS_SALIDA_POR_CLIENTE * clientes
+            )
+        )
@@ -0,0 +1,221 @@
+import json
+
+# ─── INSTRUCCIÓN DEL SISTEMA ──────────────────────────────────
+# Es igual para todos los clientes: va una sola vez como system_instruction
+# del modelo y no en cada prompt. El texto de las secciones se comparte
+# con el prompt completo del formato original.
+ANALISTA = "Eres un analista experto de clientes de Seguros Bolívar, la aseguradora más grande de Colombia."
+
+TAREA = f"""{ANALISTA}
+Tu tarea es analizar el perfil consolidado de un cliente que viene de múltiples sistemas CRM
+y generar recomendaciones accionables para el asesor comercial."""
+
+CIERRE = "Responde en español, de forma clara y directa. Usa el contexto de seguros colombianos."
+
+SECCIONES = f"""Por favor genera un análisis estructurado con las siguientes secciones:
+
+1. RESUMEN DEL CLIENTE
+   - Nombre, ciudad, fuentes donde aparece
+   - Productos actuales y su estado
+
+2. ALERTAS PRIORITARIAS
+   - Pólizas próximas a vencer
+   - Pólizas canceladas o suspendidas
+   - Leads sin gestión reciente
+
+3. OPORTUNIDADES COMERCIALES
+   - Productos que podría necesitar según su perfil
+   - Momento óptimo para contactar
+   - Probabilidad estimada de cierre
+
+4. RECOMENDACIÓN PARA EL ASESOR
+   - Acción concreta que debe tomar hoy
+   - Mensaje sugerido para contactar al cliente
+   - Prioridad: ALTA / MEDIA / BAJA
+
+{CIERRE}"""
+
+# Cómo llegan "flow360" / "leads" según serialice perfil_compacto
+def formato_registros(tabular=True):
+    if tabular:
+        return 'vienen como tablas con\n"columnas" y "filas".'
+    return 'vienen como listas de\nobjetos, uno por registro.'
+
+def instruccion_sistema(tabular=True):
+    return f"""
+{TAREA}
+
+El perfil llega en JSON compacto: "cliente" reúne los datos de identidad de todas las fuentes
+(una lista indica valores distintos entre CRMs) y "flow360" / "leads" {formato_registros(tabular)}
+
+{SECCIONES}
+"""
+
+# ─── PROMPT COMPLETO (formato original) ───────────────────────
+def construir_prompt_completo(perfil):
+    return f"""
+{TAREA}
+
+PERFIL CONSOLIDADO DEL CLIENTE:
+{json.dumps(perfil, ensure_ascii=False, indent=2)}
+
+{SECCIONES}
+"""
+
+# ─── SERIALIZACIÓN COMPACTA ───────────────────────────────────
+CAMPOS_INTERNOS = {"_id", "fuente", "created_at", "updated_at"}
+
+# Campo de identidad → nombre que usa cada CRM
+IDENTIDAD = {
+    "datos_centra": {
+        "nombre": "nombre_cliente", "email": "email", "telefono": "telefono",
+        "ciudad": "ciudad", "cedula": "cedula_cliente"
+    },
+    "datos_flow360": {
+        "nombre": "nombre_completo", "email": "correo", "telefono": "celular",
+        "ciudad": "municipio", "cedula": "identificacion"
+    },
+    "datos_leads": {
+        "nombre": "nombre", "email": "email_contacto", "telefono": "telefono_contacto",
+        "ciudad": "ciudad_interes", "cedula": "documento"
+    }
+}
+
+def _valor_compacto(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+def _registros(perfil, seccion):
+    datos = perfil.get(seccion)
+    if not datos:
+        return []
+    return datos if isinstance(datos, list) else [datos]
+
+def identidad_cliente(perfil):
+    valores = {campo: [] for campo in ("nombre", "email", "telefono", "ciudad")}
+    for seccion, campos in IDENTIDAD.items():
+        for registro in _registros(perfil, seccion):
+            for campo in valores:
+                valor = registro.get(campos[campo])
+                if valor and valor not in valores[campo]:
+                    valores[campo].append(valor)
+    cliente = {"cedula": perfil["cedula"], "fuentes": perfil["fuentes_encontradas"]}
+    for campo, encontrados in valores.items():
+        if encontrados:
+            cliente[campo] = encontrados[0] if len(encontrados) == 1 else encontrados
+    return cliente
+
+def _sin_identidad(registro, seccion):
+    excluidos = CAMPOS_INTERNOS | set(IDENTIDAD[seccion].values())
+    return {k: _valor_compacto(v) for k, v in registro.items() if k not in excluidos}
+
+def _tabla(registros):
+    columnas = []
+    for r in registros:
+        columnas.extend(k for k in r if k not in columnas)
+    return {"columnas": columnas, "filas": [[r.get(c) for c in columnas] for r in registros]}
+
+def perfil_compacto(perfil, tabular=True):
+    compacto = {"cliente": identidad_cliente(perfil)}
+    if perfil.get("datos_centra"):
+        compacto["centra"] = _sin_identidad(perfil["datos_centra"], "datos_centra")
+    for seccion, clave in (("datos_flow360", "flow360"), ("datos_leads", "leads")):
+        registros = [_sin_identidad(r, seccion) for r in _registros(perfil, seccion)]
+        if registros:
+            compacto[clave] = _tabla(registros) if tabular else registros
+    return compacto
+
+def serializar_compacto(perfil, tabular=True):
+    return json.dumps(perfil_compacto(perfil, tabular), ensure_ascii=False, separators=(",", ":"))
+
+def construir_prompt_compacto(perfil, tabular=True):
+    return f"PERFIL CONSOLIDADO DEL CLIENTE:\n{serializar_compacto(perfil, tabular)}"
+
+# ─── PROMPT POR LOTES CON SALIDA ESTRUCTURADA ─────────────────
+# Varios clientes en una sola solicitud; Gemini responde un arreglo JSON
+# (response_schema) con una entrada por cédula.
+PRIORIDADES = ["ALTA", "MEDIA", "BAJA"]
+
+def instruccion_lote(tabular=True):
+    return f"""
+{ANALISTA}
+Recibes varios perfiles consolidados de clientes, uno por línea, en JSON compacto: "cliente" reúne
+los datos de identidad de todas las fuentes y "flow360" / "leads" {formato_registros(tabular)}
+
+Para CADA perfil devuelve un objeto con:
+- cedula: la cédula del perfil, tal cual
+- resumen: nombre, ciudad, fuentes, productos actuales y su estado
+- alertas: pólizas próximas a vencer, canceladas o suspendidas y leads sin gestión reciente
+- oportunidades: productos que podría necesitar, momento óptimo de contacto y probabilidad de cierre
+- accion_recomendada: acción concreta que el asesor debe tomar hoy
+- mensaje_sugerido: mensaje para contactar al cliente
+- prioridad: ALTA / MEDIA / BAJA
+
+{CIERRE}
+"""
+
+ESQUEMA_RESPUESTA_LOTE = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "cedula": {"type": "STRING"},
+            "resumen": {"type": "STRING"},
+            "alertas": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "oportunidades": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "accion_recomendada": {"type": "STRING"},
+            "mensaje_sugerido": {"type": "STRING"},
+            "prioridad": {"type": "STRING", "enum": PRIORIDADES}
+        },
+        "required": [
+            "cedula", "resumen", "alertas", "oportunidades",
+            "accion_recomendada", "mensaje_sugerido", "prioridad"
+        ]
+    }
+}
+
+def construir_prompt_lote(perfiles, tabular=True):
+    lineas = "\n".join(serializar_compacto(p, tabular) for p in perfiles)
+    return f"PERFILES CONSOLIDADOS ({len(perfiles)} clientes):\n{lineas}"
+
+def _entrada_valida(entrada):
+    campos = ESQUEMA_RESPUESTA_LOTE["items"]["properties"]
+    if not isinstance(entrada, dict):
+        return False
+    for campo, esquema in campos.items():
+        valor = entrada.get(campo)
+        if esquema["type"] == "ARRAY":
+            if not isinstance(valor, list) or not all(isinstance(v, str) for v in valor):
+                return False
+        elif not isinstance(valor, str) or not valor.strip():
+            return False
+    return entrada["prioridad"] in PRIORIDADES
+
+# Devuelve {cedula: análisis estructurado} solo con las entradas válidas y
+# de cédulas pedidas; las demás quedan para el reintento individual.
+def validar_respuesta_lote(texto, cedulas):
+    try:
+        entradas = json.loads(texto)
+    except (TypeError, ValueError):
+        return {}
+    if not isinstance(entradas, list):
+        return {}
+    validas = {}
+    for entrada in entradas:
+        if _entrada_valida(entrada) and entrada["cedula"] in cedulas and entrada["cedula"] not in validas:
+            validas[entrada["cedula"]] = {k: v for k, v in entrada.items() if k != "cedula"}
+    return validas
+
+def formatear_analisis(estructurado):
+    def viñetas(items):
+        return "\n".join(f"- {item}" for item in items) or "- Sin información"
+    return (
+        f"**1. RESUMEN DEL CLIENTE**\n\n{estructurado['resumen']}\n\n"
+        f"**2. ALERTAS PRIORITARIAS**\n\n{viñetas(estructurado['alertas'])}\n\n"
+        f"**3. OPORTUNIDADES COMERCIALES**\n\n{viñetas(estructurado['oportunidades'])}\n\n"
+        f"**4. RECOMENDACIÓN PARA EL ASESOR**\n\n"
+        f"- Acción: {estructurado['accion_recomendada']}\n"
+        f"- Mensaje sugerido: {estructurado['mensaje_sugerido']}\n"
+        f"- Prioridad: {estructurado['prioridad']}"
+    )
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+# Colección fuente → campo con la cédula del cliente
+COLECCIONES_FUENTE = {
+    "centra": "cedula_cliente",
+    "flow360": "identificacion",
+    "gestor_leads": "documento"
+}
+ID_CONTROL = "refresco_vista360"
+
+# ─── REGISTRO DE CONTROL ──────────────────────────────────────
+# Guarda la marca de agua (inicio de la última ejecución) y, si el
+# servidor soporta change streams, el resume token correspondiente.
+def leer_control(db):
+    return db.vista360_control.find_one({"_id": ID_CONTROL}) or {}
+
+def guardar_control(db, marca_agua, token_cambios=None):
+    db.vista360_control.update_one(
+        {"_id": ID_CONTROL},
+        {"$set": {
+            "marca_agua": marca_agua,
+            "token_cambios": token_cambios,
+            "actualizado_en": datetime.now()
+        }},
+        upsert=True
+    )
+
+# ─── CHANGE STREAMS ───────────────────────────────────────────
+def pipeline_cambios():
+    return [{"$match": {
+        "ns.coll": {"$in": list(COLECCIONES_FUENTE)},
+        "operationType": {"$in": ["insert", "update", "replace"]}
+    }}]
+
+def token_actual_cambios(db):
+    # Solo los replica sets / Atlas soportan change streams; en un mongod
+    # standalone (o mongomock, que no implementa watch) se devuelve None y
+    # se usa la marca de agua.
+    try:
+        with db.watch(pipeline_cambios(), max_await_time_ms=100) as stream:
+            stream.try_next()
+            return stream.resume_token
+    except Exception:
+        return None
+
+def cedulas_por_change_stream(db, token):
+    cedulas = set()
+    with db.watch(
+        pipeline_cambios(),
+        full_document="updateLookup",
+        resume_after=token,
+        max_await_time_ms=100
+    ) as stream:
+        while True:
+            cambio = stream.try_next()
+            if cambio is None:
+                break
+            campo = COLECCIONES_FUENTE[cambio["ns"]["coll"]]
+            cedula = (cambio.get("fullDocument") or {}).get(campo)
+            if cedula:
+                cedulas.add(cedula)
+        return cedulas, stream.resume_token
+
+# ─── MARCA DE AGUA ────────────────────────────────────────────
+def cedulas_por_marca_agua(db, desde):
+    cedulas = set()
+    filtro = {"$or": [{"created_at": {"$gt": desde}}, {"updated_at": {"$gt": desde}}]}
+    for coleccion, campo in COLECCIONES_FUENTE.items():
+        for doc in db[coleccion].find(filtro, {"_id": 0, campo: 1}):
+            cedulas.add(doc[campo])
+    return cedulas
+
+# ─── DETECTAR CÉDULAS MODIFICADAS ─────────────────────────────
+# Devuelve (cédulas, token) usando change streams cuando hay un token
+# guardado y el oplog aún lo conserva; si no, cae a la marca de agua.
+# Los borrados en las fuentes no se detectan: los corrige la próxima
+# reconstrucción completa.
+def detectar_cedulas_modificadas(db, control):
+    token = control.get("token_cambios")
+    if token:
+        try:
+            return cedulas_por_change_stream(db, token)
+        except PyMongoError as error:
+            print(f"⚠️ Change stream no disponible ({error}), usando marca de agua")
+    nuevo_token = token_actual_cambios(db)
+    return cedulas_por_marca_agua(db, control["marca_agua"]), nuevo_token
@@ -0,0 +1,195 @@
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from pymongo import UpdateOne
+
+# ─── CONFIGURACIÓN ────────────────────────────────────────────
+import os
+TRIAGE_TOP = int(os.environ.get("TRIAGE_TOP", "0"))  # 0 = todos van al LLM
+DIAS_POR_VENCER = 30
+DIAS_SIN_SEGUIMIENTO = 15
+ESTADOS_LEAD_CERRADOS = ["Cerrado ganado", "Cerrado perdido"]
+
+# Peso de cada alerta (se cuentan hasta 3 ocurrencias por cliente)
+PESOS = {
+    "polizas_por_vencer": 30,
+    "polizas_vencidas_suspendidas": 25,
+    "polizas_canceladas": 15,
+    "leads_sin_seguimiento": 20
+}
+PESO_PROBABILIDAD = 0.2  # sobre la mayor probabilidad de cierre de un lead abierto
+UMBRAL_ALTA = 50
+UMBRAL_MEDIA = 20
+# Cédulas por consulta en la pasada que elige los top N
+TAMANO_LOTE_TRIAGE = 1000
+
+# ─── LECTURA COLUMNAR ─────────────────────────────────────────
+# pandas se importa al calcular, no al importar el módulo: el agente y los
+# workers solo lo cargan al llegar al primer lote.
+CAMPOS_CENTRA = ["estado_poliza", "fecha_vencimiento"]
+CAMPOS_FLOW360 = ["estado", "fecha_renovacion"]
+CAMPOS_LEADS = ["estado_lead", "fecha_ultimo_seguimiento", "probabilidad_cierre", "valor_estimado"]
+
+def _marco_registros(registros, campo_cedula, campos):
+    import pandas as pd
+
+    marco = pd.DataFrame(registros, columns=[campo_cedula, *campos])
+    return marco.rename(columns={campo_cedula: "cedula"})
+
+def _marco(coleccion, campo_cedula, campos, cedulas=None):
+    filtro = {campo_cedula: {"$in": list(cedulas)}} if cedulas is not None else {}
+    proyeccion = {"_id": 0, campo_cedula: 1, **{c: 1 for c in campos}}
+    return _marco_registros(list(coleccion.find(filtro, proyeccion)), campo_cedula, campos)
+
+def _fechas(serie):
+    import pandas as pd
+
+    return pd.to_datetime(serie, errors="coerce")
+
+# ─── TRIAGE VECTORIZADO ───────────────────────────────────────
+# Calcula en bloque, con operaciones de columna y groupby, las alertas
+# que el prompt pide como "ALERTAS PRIORITARIAS", un puntaje y una
+# prioridad por cliente. Devuelve un DataFrame indexado por cédula y
+# ordenado de mayor a menor puntaje.
+def calcular_triage(db, cedulas=None, hoy=None):
+    return _puntuar(
+        _marco(db.centra, "cedula_cliente", CAMPOS_CENTRA, cedulas),
+        _marco(db.flow360, "identificacion", CAMPOS_FLOW360, cedulas),
+        _marco(db.gestor_leads, "documento", CAMPOS_LEADS, cedulas),
+        hoy
+    )
+
+# Lo mismo sobre un lote de perfiles ya consolidados, sin volver a leer
+# las fuentes: el agente lo calcula por lote de consolidación.
+def triage_perfiles(perfiles, hoy=None):
+    return _puntuar(
+        _marco_registros([p["datos_centra"] for p in perfiles if p.get("datos_centra")],
+                         "cedula_cliente", CAMPOS_CENTRA),
+        _marco_registros([r for p in perfiles for r in p.get("datos_flow360") or []],
+                         "identificacion", CAMPOS_FLOW360),
+        _marco_registros([r for p in perfiles for r in p.get("datos_leads") or []],
+                         "documento", CAMPOS_LEADS),
+        hoy
+    )
+
+def _puntuar(centra, flow, leads, hoy=None):
+    import numpy as np
+    import pandas as pd
+
+    hoy = pd.Timestamp(hoy or datetime.now())
+    limite_vencimiento = hoy + pd.Timedelta(days=DIAS_POR_VENCER)
+    limite_seguimiento = hoy - pd.Timedelta(days=DIAS_SIN_SEGUIMIENTO)
+
+    vencimiento = _fechas(centra["fecha_vencimiento"])
+    por_centra = pd.DataFrame({
+        "cedula": centra["cedula"],
+        "polizas_por_vencer": (centra["estado_poliza"] == "Activa") & vencimiento.between(hoy, limite_vencimiento),
+        "polizas_vencidas_suspendidas": centra["estado_poliza"].isin(["Vencida", "Suspendida"])
+    }).groupby("cedula").sum()
+
+    renovacion = _fechas(flow["fecha_renovacion"])
+    por_flow = pd.DataFrame({
+        "cedula": flow["cedula"],
+        "polizas_por_vencer": (flow["estado"] == "Por vencer")
+        | ((flow["estado"] != "Cancelada") & renovacion.between(hoy, limite_vencimiento)),
+        "polizas_canceladas": flow["estado"] == "Cancelada"
+    }).groupby("cedula").sum()
+
+    abierto = ~leads["estado_lead"].isin(ESTADOS_LEAD_CERRADOS)
+    por_leads = pd.DataFrame({
+        "cedula": leads["cedula"],
+        "leads_sin_seguimiento": abierto & (_fechas(leads["fecha_ultimo_seguimiento"]) < limite_seguimiento),
+        "valor_leads_abiertos": pd.to_numeric(leads["valor_estimado"], errors="coerce").where(abierto, 0),
+        "probabilidad_max": pd.to_numeric(leads["probabilidad_cierre"], errors="coerce").where(abierto, 0)
+    }).groupby("cedula").agg({
+        "leads_sin_seguimiento": "sum", "valor_leads_abiertos": "sum", "probabilidad_max": "max"
+    })
+
+    triage = pd.concat([por_centra, por_flow, por_leads]).groupby(level=0).agg({
+        "polizas_por_vencer": "sum",
+        "polizas_vencidas_suspendidas": "sum",
+        "polizas_canceladas": "sum",
+        "leads_sin_seguimiento": "sum",
+        "valor_leads_abiertos": "sum",
+        "probabilidad_max": "max"
+    }).fillna(0)
+
+    conteos = np.minimum(triage[list(PESOS)].to_numpy(dtype=float), 3)
+    puntaje = conteos @ np.array(list(PESOS.values()), dtype=float)
+    puntaje += PESO_PROBABILIDAD * triage["probabilidad_max"].to_numpy(dtype=float)
+    triage["puntaje"] = puntaje.round(1)
+    triage["prioridad"] = np.select(
+        [puntaje >= UMBRAL_ALTA, puntaje >= UMBRAL_MEDIA], ["ALTA", "MEDIA"], "BAJA"
+    )
+    return triage.sort_values("puntaje", ascending=False)
+
+# ─── SELECCIÓN PARA EL LLM ────────────────────────────────────
+# Las top_n cédulas con alguna alerta o lead abierto (puntaje > 0). Se
+# recorren por lotes y solo se conservan las top_n mejores: la memoria no
+# depende del número de clientes.
+def seleccionar_para_llm(db, cedulas, top_n=TRIAGE_TOP, tamano_lote=TAMANO_LOTE_TRIAGE, hoy=None):
+    hoy = hoy or datetime.now()
+    mejores = []
+    iterador = iter(cedulas)
+    while lote := list(islice(iterador, tamano_lote)):
+        triage = calcular_triage(db, lote, hoy)
+        accionables = triage[triage["puntaje"] > 0]
+        candidatos = zip(accionables["puntaje"].tolist(), accionables.index.tolist())
+        mejores = heapq.nlargest(top_n, [*mejores, *candidatos])
+    return {cedula for _, cedula in mejores}
+
+def banderas_triage(triage):
+    # tolist() entrega tipos nativos de Python, que BSON sí puede codificar
+    enteros = ["polizas_por_vencer", "polizas_vencidas_suspendidas", "polizas_canceladas", "leads_sin_seguimiento"]
+    columnas = {c: triage[c].astype(int).tolist() for c in enteros}
+    columnas["valor_leads_abiertos"] = triage["valor_leads_abiertos"].astype(float).tolist()
+    columnas["puntaje"] = triage["puntaje"].astype(float).tolist()
+    columnas["prioridad"] = triage["prioridad"].tolist()
+    return {
+        cedula: {campo: valores[i] for campo, valores in columnas.items()}
+        for i, cedula in enumerate(triage.index.tolist())
+    }
+
+def banderas_vacias():
+    return {
+        "polizas_por_vencer": 0, "polizas_vencidas_suspendidas": 0, "polizas_canceladas": 0,
+        "leads_sin_seguimiento": 0, "valor_leads_abiertos": 0.0, "puntaje": 0.0, "prioridad": "BAJA"
+    }
+
+def analisis_triage(banderas):
+    alertas = [
+        (banderas["polizas_por_vencer"], "póliza(s) próximas a vencer o renovar"),
+        (banderas["polizas_vencidas_suspendidas"], "póliza(s) vencidas o suspendidas en CENTRA"),
+        (banderas["polizas_canceladas"], "póliza(s) canceladas en FLOW360"),
+        (banderas["leads_sin_seguimiento"], f"lead(s) abiertos sin seguimiento en {DIAS_SIN_SEGUIMIENTO} días")
+    ]
+    lineas = "\n".join(f"- {n} {texto}" for n, texto in alertas if n) or "- Sin alertas"
+    return (
+        f"**Sin análisis IA** — prioridad {banderas['prioridad']} por reglas "
+        f"(puntaje {banderas['puntaje']:.0f})\n\n**ALERTAS PRIORITARIAS**\n\n{lineas}"
+    )
+
+# ─── GUARDAR BANDERAS EN VISTA 360 ────────────────────────────
+def guardar_triage(db, banderas, tamano_lote=1000):
+    operaciones = [
+        UpdateOne({"cedula": cedula}, {"$set": {"triage": datos}})
+        for cedula, datos in banderas.items()
+    ]
+    for i in range(0, len(operaciones), tamano_lote):
+        db.vista360.bulk_write(operaciones[i:i + tamano_lote], ordered=False)
+
+# ─── EJECUTAR ─────────────────────────────────────────────────
+if __name__ == "__main__":
+    import time
+    from conexion import obtener_db
+
+    db = obtener_db()
+
+    print("🚦 Calculando triage de clientes...")
+    inicio = time.perf_counter()
+    triage = calcular_triage(db)
+    print(f"   {len(triage):,} clientes en {time.perf_counter() - inicio:.2f}s")
+    print(triage["prioridad"].value_counts().to_string())
+    guardar_triage(db, banderas_triage(triage))
+    print(f"\n📋 Top 10:\n{triage.head(10).to_string()}")
@@ -1,21 +1,128 @@
-import google.generativeai as genai
-from pymongo import MongoClient
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
 from datetime import datetime
-import json
+from collections import defaultdict
+from itertools import islice
+import argparse
+import cProfile
+import heapq
+
+from agregados import agregados_cliente
+from analisis_concurrente import (
+    GEMINI_CONCURRENCIA, GEMINI_RPM, GEMINI_TPM,
+    LimitadorTasa, ModeloControlado, analizar_concurrente, analizar_concurrente_por_lotes,
+    es_error_reintentable, estimar_tokens
+)
+from busqueda import campos_busqueda
+from cache_analisis import CacheAnalisis, huella_perfil
+from cola_asesor import ColaAsesor
+from conexion import Diferido, obtener_cliente, obtener_db, obtener_genai
+from estadisticas import EstadisticasVista360
+from indices import INDICES, crear_indices
+from instrumentacion import instrumentos
+from prompts import (
+    ESQUEMA_RESPUESTA_LOTE, construir_prompt_completo, construir_prompt_compacto, construir_prompt_lote,
+    formatear_analisis, instruccion_lote, instruccion_sistema, validar_respuesta_lote
+)
+from refresco_incremental import (
+    COLECCIONES_FUENTE, detectar_cedulas_modificadas, guardar_control, leer_control, token_actual_cambios
+)
+from triage import (
+    TRIAGE_TOP, analisis_triage, banderas_triage, banderas_vacias, seleccionar_para_llm, triage_perfiles
+)
 
 # ─── CONFIGURACIÓN ────────────────────────────────────────────
 import os
-MONGODB_URI = os.environ.get("MONGODB_URI", "")
 DATABASE_NAME = os.environ.get("DATABASE_NAME", "vista360")
-GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY", "")
+GEMINI_MODELO = os.environ.get("GEMINI_MODELO", "gemini-2.0-flash")
+# completo = JSON indentado con instrucciones en cada prompt (formato original)
+# compacto = JSON sin espacios ni ids internos; tabular = compacto con tablas
+PROMPT_FORMATO = os.environ.get("PROMPT_FORMATO", "tabular")
+# Clientes por solicitud en el modo por lotes (1 = un cliente por llamada)
+GEMINI_LOTE = int(os.environ.get("GEMINI_LOTE", "1"))
+# 0 = fechas e _id se normalizan en Python (comportamiento original)
+NORMALIZAR_EN_SERVIDOR = os.environ.get("NORMALIZAR_EN_SERVIDOR", "1") == "1"
+
+# En los formatos compactos la instrucción va como system_instruction y se
+# cobra en cada llamada. No se usa un contexto cacheado de Gemini: exige un
+# mínimo de tokens muy por encima de los ~300 de la instrucción.
+def instruccion_modelo():
+    if PROMPT_FORMATO == "completo":
+        return None
+    return instruccion_sistema(tabular=PROMPT_FORMATO == "tabular")
+
+def instruccion_modelo_lote():
+    return instruccion_lote(tabular=PROMPT_FORMATO != "compacto")
+
+def crear_modelo():
+    return obtener_genai().GenerativeModel(GEMINI_MODELO, system_instruction=instruccion_modelo())
+
+def crear_modelo_lote():
+    return obtener_genai().GenerativeModel(
+        GEMINI_MODELO,
+        system_instruction=instruccion_modelo_lote(),
+        generation_config={
+            "response_mime_type": "application/json",
+            "response_schema": ESQUEMA_RESPUESTA_LOTE
+        }
+    )
 
-genai.configure(api_key=GEMINI_API_KEY)
-modelo = genai.GenerativeModel("gemini-2.0-flash")
-client = MongoClient(MONGODB_URI)
-db = client[DATABASE_NAME]
+_modelo = None
+
+def obtener_modelo():
+    global _modelo
+    if _modelo is None:
+        _modelo = crear_modelo()
+    return _modelo
+
+# Conexión y modelo se crean en el primer uso (ver conexion.py); importar
+# el agente no conecta a MongoDB ni carga google.generativeai.
+modelo = Diferido(obtener_modelo)
+client = Diferido(obtener_cliente)
+db = Diferido(lambda: obtener_db(DATABASE_NAME))
 
 # ─── CONSOLIDAR PERFIL DEL CLIENTE ────────────────────────────
-def consolidar_perfil(cedula):
+def normalizar_documento(doc):
+    with instrumentos.etapa("normalizacion_fechas"):
+        doc["_id"] = str(doc["_id"])
+        for k, v in doc.items():
+            if isinstance(v, datetime):
+                doc[k] = v.strftime("%Y-%m-%d")
+    return doc
+
+# La misma normalización como etapa de agregación: el servidor entrega las
+# fechas de primer nivel como "AAAA-MM-DD" ($dateToString, en UTC como los
+# datetime de pymongo) y el _id como texto, sin recorrer cada documento en
+# Python. El orden de los campos se conserva.
+ETAPA_NORMALIZAR = {"$replaceRoot": {"newRoot": {"$arrayToObject": {"$map": {
+    "input": {"$objectToArray": "$$ROOT"},
+    "as": "campo",
+    "in": {"k": "$$campo.k", "v": {"$switch": {
+        "branches": [
+            {"case": {"$eq": ["$$campo.k", "_id"]}, "then": {"$toString": "$$campo.v"}},
+            {"case": {"$eq": [{"$type": "$$campo.v"}, "date"]},
+             "then": {"$dateToString": {"format": "%Y-%m-%d", "date": "$$campo.v"}}}
+        ],
+        "default": "$$campo.v"
+    }}}
+}}}}}
+
+_normalizar_en_servidor = NORMALIZAR_EN_SERVIDOR
+
+# Si el servidor no soporta la etapa (o es mongomock) se normaliza en
+# Python durante el resto del proceso.
+def buscar_normalizados(coleccion, filtro, limite=0):
+    global _normalizar_en_servidor
+    if _normalizar_en_servidor:
+        pipeline = [{"$match": filtro}, *([{"$limit": limite}] if limite else []), ETAPA_NORMALIZAR]
+        try:
+            return coleccion.aggregate(pipeline)
+        except (OperationFailure, NotImplementedError) as error:
+            _normalizar_en_servidor = False
+            print(f"⚠️ Normalización en el servidor no disponible ({error}), se hace en Python")
+    return (normalizar_documento(doc) for doc in coleccion.find(filtro).limit(limite))
+
+def armar_perfil(cedula, centra, flow_registros, leads):
     perfil = {
         "cedula": cedula,
         "fuentes_encontradas": [],
@@ -24,39 +131,19 @@ def consolidar_perfil(cedula):
         "datos_leads": []
     }
 
-    # Buscar en CENTRA
-    centra = db.centra.find_one({"cedula_cliente": cedula})
     if centra:
-        centra["_id"] = str(centra["_id"])
-        for k, v in centra.items():
-            if isinstance(v, datetime):
-                centra[k] = v.strftime("%Y-%m-%d")
         perfil["datos_centra"] = centra
         perfil["fuentes_encontradas"].append("CENTRA")
         perfil["nombre"] = centra.get("nombre_cliente")
         perfil["email"] = centra.get("email")
         perfil["ciudad"] = centra.get("ciudad")
 
-    # Buscar en FLOW360
-    flow_registros = list(db.flow360.find({"identificacion": cedula}))
-    for r in flow_registros:
-        r["_id"] = str(r["_id"])
-        for k, v in r.items():
-            if isinstance(v, datetime):
-                r[k] = v.strftime("%Y-%m-%d")
     if flow_registros:
         perfil["datos_flow360"] = flow_registros
         perfil["fuentes_encontradas"].append("FLOW360")
         if not perfil.get("nombre"):
             perfil["nombre"] = flow_registros[0].get("nombre_completo")
 
-    # Buscar en GESTOR LEADS
-    leads = list(db.gestor_leads.find({"documento": cedula}))
-    for r in leads:
-        r["_id"] = str(r["_id"])
-        for k, v in r.items():
-            if isinstance(v, datetime):
-                r[k] = v.strftime("%Y-%m-%d")
     if leads:
         perfil["datos_leads"] = leads
         perfil["fuentes_encontradas"].append("GESTOR_LEADS")
@@ -65,93 +152,483 @@ def consolidar_perfil(cedula):
 
     return perfil
 
+@instrumentos.medir("consolidacion_perfil")
+def consolidar_perfil(cedula):
+    # Buscar en CENTRA
+    centra = next(iter(buscar_normalizados(db.centra, {"cedula_cliente": cedula}, limite=1)), None)
+
+    # Buscar en FLOW360
+    flow_registros = list(buscar_normalizados(db.flow360, {"identificacion": cedula}))
+
+    # Buscar en GESTOR LEADS
+    leads = list(buscar_normalizados(db.gestor_leads, {"documento": cedula}))
+
+    return armar_perfil(cedula, centra, flow_registros, leads)
+
+# ─── CONSOLIDACIÓN MASIVA ─────────────────────────────────────
+# Una consulta $in por colección y por lote, en lugar de tres consultas
+# por cédula. El resultado es idéntico al de consolidar_perfil: en CENTRA
+# se conserva el primer documento de cada cédula (como find_one) y en
+# FLOW360 / Gestor Leads se respeta el orden en que llegan los registros.
+TAMANO_LOTE_CONSOLIDACION = 1000
+
+@instrumentos.medir("consolidacion_lote")
+def consolidar_perfiles_lote(cedulas):
+    cedulas = list(cedulas)
+    filtro = {"$in": cedulas}
+
+    centra_por_cedula = {}
+    for doc in buscar_normalizados(db.centra, {"cedula_cliente": filtro}):
+        if doc["cedula_cliente"] not in centra_por_cedula:
+            centra_por_cedula[doc["cedula_cliente"]] = doc
+
+    flow_por_cedula = defaultdict(list)
+    for doc in buscar_normalizados(db.flow360, {"identificacion": filtro}):
+        flow_por_cedula[doc["identificacion"]].append(doc)
+
+    leads_por_cedula = defaultdict(list)
+    for doc in buscar_normalizados(db.gestor_leads, {"documento": filtro}):
+        leads_por_cedula[doc["documento"]].append(doc)
+
+    return [
+        armar_perfil(
+            cedula,
+            centra_por_cedula.get(cedula),
+            flow_por_cedula.get(cedula, []),
+            leads_por_cedula.get(cedula, [])
+        )
+        for cedula in cedulas
+    ]
+
+def consolidar_perfiles(cedulas=None, tamano_lote=TAMANO_LOTE_CONSOLIDACION):
+    if cedulas is None:
+        cedulas = iterar_cedulas()
+    lote = []
+    for cedula in cedulas:
+        lote.append(cedula)
+        if len(lote) >= tamano_lote:
+            yield from consolidar_perfiles_lote(lote)
+            lote = []
+    if lote:
+        yield from consolidar_perfiles_lote(lote)
+
 # ─── GENERAR ANÁLISIS CON GEMINI ──────────────────────────────
-def analizar_cliente(perfil):
+# Subir la versión al cambiar el prompt invalida la caché de análisis
+VERSION_PROMPT = f"v2-{PROMPT_FORMATO}" + ("-lote" if GEMINI_LOTE > 1 else "")
+
+def construir_prompt(perfil):
+    if PROMPT_FORMATO == "completo":
+        return construir_prompt_completo(perfil)
+    return construir_prompt_compacto(perfil, tabular=PROMPT_FORMATO == "tabular")
+
+def analizar_cliente(perfil, modelo_ia=None):
     if not perfil["fuentes_encontradas"]:
         return "No se encontró información de este cliente en ningún CRM."
 
-    prompt = f"""
-Eres un analista experto de clientes de Seguros Bolívar, la aseguradora más grande de Colombia.
-Tu tarea es analizar el perfil consolidado de un cliente que viene de múltiples sistemas CRM
-y generar recomendaciones accionables para el asesor comercial.
+    with instrumentos.etapa("construccion_prompt"):
+        prompt = construir_prompt(perfil)
+    respuesta = (modelo_ia or modelo).generate_content(prompt)
+    return respuesta.text
 
-PERFIL CONSOLIDADO DEL CLIENTE:
-{json.dumps(perfil, ensure_ascii=False, indent=2)}
+def analizar_con_cache(perfil, modelo_ia, cache):
+    huella = huella_perfil(perfil, VERSION_PROMPT)
+    with instrumentos.etapa("cache_consulta"):
+        analisis = cache.obtener(huella)
+    if analisis is None:
+        analisis = analizar_cliente(perfil, modelo_ia)
+        cache.guardar(huella, perfil["cedula"], analisis)
+    return analisis
 
-Por favor genera un análisis estructurado con las siguientes secciones:
+# ─── ANÁLISIS POR LOTES (JSON ESTRUCTURADO) ───────────────────
+# Devuelve un análisis estructurado (dict) por perfil, en el mismo orden.
+# Las entradas que faltan o no validan se piden de nuevo una por una; si
+# la solicitud individual también falla se usa el análisis en markdown, y
+# si esta falla la entrada queda en None (procesar_perfiles usa el triage).
+# Si el lote falló por límite de tasa aun tras los reintentos, no se piden
+# las entradas por separado: solo multiplicaría las llamadas rechazadas.
+def analizar_lote(perfiles, modelo_lote, modelo_ia=None):
+    cedulas = {p["cedula"] for p in perfiles}
+    saturado = False
+    try:
+        with instrumentos.etapa("construccion_prompt"):
+            prompt = construir_prompt_lote(perfiles, tabular=PROMPT_FORMATO != "compacto")
+        respuesta = modelo_lote.generate_content(prompt)
+        validas = validar_respuesta_lote(respuesta.text, cedulas)
+    except Exception as error:
+        print(f"⚠️ Lote de {len(perfiles)} sin respuesta válida: {error}")
+        validas = {}
+        saturado = es_error_reintentable(error)
 
-1. RESUMEN DEL CLIENTE
-   - Nombre, ciudad, fuentes donde aparece
-   - Productos actuales y su estado
+    instrumentos.contar("gemini.lote.entradas_invalidas", len(cedulas) - len(validas))
+    if saturado:
+        instrumentos.contar("analisis.fallidos", len(perfiles))
+        return [None] * len(perfiles)
+    resultados = []
+    for perfil in perfiles:
+        analisis = validas.get(perfil["cedula"])
+        if analisis is None and len(perfiles) > 1:
+            analisis = analizar_lote([perfil], modelo_lote, modelo_ia)[0]
+        elif analisis is None:
+            try:
+                analisis = analizar_cliente(perfil, modelo_ia)
+            except Exception as error:
+                print(f"⚠️ Cliente {perfil['cedula']} sin análisis: {error}")
+                instrumentos.contar("analisis.fallidos")
+        resultados.append(analisis)
+    return resultados
 
-2. ALERTAS PRIORITARIAS
-   - Pólizas próximas a vencer
-   - Pólizas canceladas o suspendidas
-   - Leads sin gestión reciente
+def analizar_lote_con_cache(perfiles, motor):
+    huellas = [huella_perfil(p, VERSION_PROMPT) for p in perfiles]
+    with instrumentos.etapa("cache_consulta"):
+        analisis = [motor.cache.obtener(h) for h in huellas]
+    faltantes = [i for i, a in enumerate(analisis) if a is None]
+    if faltantes:
+        nuevos = analizar_lote([perfiles[i] for i in faltantes], motor.lote, motor.individual)
+        for i, nuevo in zip(faltantes, nuevos):
+            analisis[i] = nuevo
+            if nuevo is not None:
+                motor.cache.guardar(huellas[i], perfiles[i]["cedula"], nuevo)
+    return analisis
 
-3. OPORTUNIDADES COMERCIALES
-   - Productos que podría necesitar según su perfil
-   - Momento óptimo para contactar
-   - Probabilidad estimada de cierre
+# ─── OBTENER TODOS LOS CLIENTES ───────────────────────────────
+# El universo de cédulas se deduplica en el servidor ($unionWith + $group,
+# con allowDiskUse) y llega por lotes: la memoria del worker no depende
+# del número de clientes. Cada rama empieza con un $sort sobre el índice
+# de cédula, así la lectura es un recorrido cubierto del índice. Las
+# cédulas salen ordenadas; `desde` (exclusivo) y `hasta` (inclusivo) acotan
+# el rango en cada índice: checkpoints y rangos de las ejecuciones por shards.
+TAMANO_LOTE_CEDULAS = 1000
 
-4. RECOMENDACIÓN PARA EL ASESOR
-   - Acción concreta que debe tomar hoy
-   - Mensaje sugerido para contactar al cliente
-   - Prioridad: ALTA / MEDIA / BAJA
+def _rango_cedulas(campo, desde=None, hasta=None):
+    rango = {}
+    if desde:
+        rango["$gt"] = desde
+    if hasta:
+        rango["$lte"] = hasta
+    return {campo: rango} if rango else None
 
-Responde en español, de forma clara y directa. Usa el contexto de seguros colombianos.
-"""
+def pipeline_cedulas(desde=None, hasta=None):
+    ramas = [
+        ([{"$match": _rango_cedulas(campo, desde, hasta)}] if desde or hasta else [])
+        + [{"$sort": {campo: 1}}, {"$project": {"_id": 0, "cedula": f"${campo}"}}]
+        for campo in COLECCIONES_FUENTE.values()
+    ]
+    colecciones = list(COLECCIONES_FUENTE)
+    return ramas[0] + [
+        {"$unionWith": {"coll": coleccion, "pipeline": rama}}
+        for coleccion, rama in zip(colecciones[1:], ramas[1:])
+    ] + [{"$group": {"_id": "$cedula"}}, {"$sort": {"_id": 1}}]
 
-    respuesta = modelo.generate_content(prompt)
-    return respuesta.text
+def _cedulas_ordenadas(coleccion, campo, tamano_lote, desde, hasta):
+    filtro = _rango_cedulas(campo, desde, hasta) or {campo: {"$ne": None}}
+    cursor = db[coleccion].find(filtro, {"_id": 0, campo: 1})
+    for doc in cursor.sort(campo, 1).batch_size(tamano_lote):
+        yield doc[campo]
+
+def _cedulas_por_indices(tamano_lote, desde=None, hasta=None):
+    # Mezcla de los tres recorridos ordenados, descartando repetidas
+    anterior = None
+    flujos = [
+        _cedulas_ordenadas(coleccion, campo, tamano_lote, desde, hasta)
+        for coleccion, campo in COLECCIONES_FUENTE.items()
+    ]
+    for cedula in heapq.merge(*flujos):
+        if cedula != anterior:
+            yield cedula
+            anterior = cedula
+
+def iterar_cedulas(tamano_lote=TAMANO_LOTE_CEDULAS, desde=None, hasta=None):
+    primera = next(iter(COLECCIONES_FUENTE))
+    try:
+        cursor = db[primera].aggregate(pipeline_cedulas(desde, hasta), allowDiskUse=True, batchSize=tamano_lote)
+    except (OperationFailure, NotImplementedError):
+        # MongoDB < 4.4 (o mongomock) no soporta $unionWith
+        yield from _cedulas_por_indices(tamano_lote, desde, hasta)
+        return
+    for doc in cursor:
+        yield doc["_id"]
 
-# ─── OBTENER TODOS LOS CLIENTES ───────────────────────────────
 def obtener_todas_cedulas():
-    cedulas = set()
-    for doc in db.centra.find({}, {"cedula_cliente": 1}):
-        cedulas.add(doc["cedula_cliente"])
-    for doc in db.flow360.find({}, {"identificacion": 1}):
-        cedulas.add(doc["identificacion"])
-    for doc in db.gestor_leads.find({}, {"documento": 1}):
-        cedulas.add(doc["documento"])
-    return list(cedulas)
+    return list(iterar_cedulas())
+
+# Cédulas que parten el universo en `partes` rangos de tamaño parecido: la
+# última cédula de cada rango, salvo la del último. Un solo recorrido con
+# $bucketAuto; sin $unionWith se cuenta y se corta en dos recorridos.
+def limites_cedulas(partes):
+    primera = next(iter(COLECCIONES_FUENTE))
+    cubetas = {"$bucketAuto": {"groupBy": "$_id", "buckets": partes, "output": {"ultima": {"$max": "$_id"}}}}
+    try:
+        return [c["ultima"] for c in db[primera].aggregate(pipeline_cedulas() + [cubetas], allowDiskUse=True)][:-1]
+    except (OperationFailure, NotImplementedError):
+        total = sum(1 for _ in _cedulas_por_indices(TAMANO_LOTE_CEDULAS))
+        cortes = {total * i // partes - 1 for i in range(1, partes) if total * i // partes > 0}
+        return [c for i, c in enumerate(_cedulas_por_indices(TAMANO_LOTE_CEDULAS)) if i in cortes]
+
+# ─── ESCRITOR DE RESULTADOS ───────────────────────────────────
+# Recibe cada documento apenas termina su análisis y lo escribe en lotes:
+# insert_many al reconstruir, o upserts por cédula con bulk_write en el
+# refresco incremental.
+TAMANO_LOTE_ESCRITURA = 100
+
+class EscritorVista360:
+    def __init__(self, coleccion, tamano_lote=TAMANO_LOTE_ESCRITURA, upsert=False, estadisticas=None,
+                 cola=None):
+        self.coleccion = coleccion
+        self.tamano_lote = tamano_lote
+        self.upsert = upsert
+        self.estadisticas = estadisticas
+        self.cola = cola
+        self.pendientes = []
+        self.escritos = 0
+
+    def agregar(self, documento):
+        self.pendientes.append(documento)
+        if len(self.pendientes) >= self.tamano_lote:
+            self.vaciar()
+
+    @instrumentos.medir("escritura_vista360")
+    def vaciar(self):
+        if not self.pendientes:
+            return
+        if self.upsert:
+            if self.estadisticas:
+                anteriores = {
+                    d["cedula"]: d
+                    for d in self.coleccion.find(
+                        {"cedula": {"$in": [p["cedula"] for p in self.pendientes]}},
+                        {"cedula": 1, "ciudad": 1, "fuentes": 1, "agregados": 1}
+                    )
+                }
+                for d in self.pendientes:
+                    self.estadisticas.registrar(d, anteriores.get(d["cedula"]))
+            self.coleccion.bulk_write(
+                [ReplaceOne({"cedula": d["cedula"]}, d, upsert=True) for d in self.pendientes],
+                ordered=False
+            )
+            if self.estadisticas:
+                self.estadisticas.aplicar()
+        else:
+            if self.estadisticas:
+                for d in self.pendientes:
+                    self.estadisticas.registrar(d)
+            self.coleccion.insert_many(self.pendientes)
+        if self.cola:
+            self.cola.escribir(self.pendientes, upsert=self.upsert)
+        self.escritos += len(self.pendientes)
+        self.pendientes = []
+
+def documento_vista360(perfil, analisis, triage=None):
+    nombre = perfil.get("nombre", "Sin nombre")
+    documento = {
+        "cedula": perfil["cedula"],
+        "nombre": nombre,
+        **campos_busqueda(nombre),
+        "ciudad": perfil.get("ciudad", "Sin ciudad"),
+        "fuentes": perfil["fuentes_encontradas"],
+        "analisis": analisis,
+        "agregados": agregados_cliente(perfil),
+        "perfil_completo": perfil
+    }
+    # Los análisis por lotes llegan estructurados: se guardan los campos y
+    # se genera el markdown que muestra el dashboard
+    if isinstance(analisis, dict):
+        documento["analisis"] = formatear_analisis(analisis)
+        documento["analisis_estructurado"] = analisis
+        documento["prioridad"] = analisis["prioridad"]
+    if triage:
+        documento["triage"] = triage
+    return documento
+
+# ─── PROCESAR PERFILES ────────────────────────────────────────
+# Modelos (individual y por lotes) que comparten limitador, y la caché.
+class MotorAnalisis:
+    def __init__(self, modelo_ia=None, limitador=None, tamano_lote=GEMINI_LOTE):
+        limitador = limitador or LimitadorTasa(GEMINI_RPM, GEMINI_TPM)
+        self.tamano_lote = tamano_lote
+        # El límite de TPM cuenta también la system_instruction de cada llamada
+        instruccion = instruccion_modelo()
+        self.individual = ModeloControlado(
+            modelo_ia or modelo, limitador,
+            tokens_instruccion=estimar_tokens(instruccion) if instruccion else 0
+        )
+        self.lote = None
+        if tamano_lote > 1:
+            self.lote = ModeloControlado(
+                modelo_ia or crear_modelo_lote(), limitador,
+                tokens_instruccion=estimar_tokens(instruccion_modelo_lote())
+            )
+        self.cache = CacheAnalisis(db.vista360_cache)
+        self.cache.asegurar_indices()
+
+# Los documentos van al escritor a medida que se analizan; no se guardan
+# en memoria, solo se cuentan. Las banderas de triage se calculan por lote
+# de consolidación y se guardan en todos los documentos. Con `seleccion`,
+# solo esas cédulas van al LLM; las demás reutilizan su análisis en caché
+# o, si no hay, reciben el resumen de alertas por reglas. Ese mismo resumen
+# reemplaza los análisis que fallan, sin guardarlo en caché: el cliente no
+# desaparece de vista360 y se vuelve a pedir al LLM en la próxima
+# ejecución. Sus cédulas se agregan a `fallidos` si se pasa una lista.
+def procesar_perfiles(perfiles, escritor, motor, concurrencia=GEMINI_CONCURRENCIA,
+                      seleccion=None, fallidos=None):
+    procesados = 0
+    banderas = {}  # solo las del lote actual y los perfiles en vuelo
+
+    def escribir(perfil, analisis):
+        nonlocal procesados
+        triage = banderas.pop(perfil["cedula"], None) or banderas_vacias()
+        if analisis is None:
+            analisis = analisis_triage(triage)
+            if fallidos is not None:
+                fallidos.append(perfil["cedula"])
+        escritor.agregar(documento_vista360(perfil, analisis, triage))
+        procesados += 1
+        print(f"✅ {escritor.escritos + len(escritor.pendientes)}. {perfil.get('nombre', perfil['cedula'])} procesado")
+
+    def para_llm():
+        iterador = iter(perfiles)
+        while lote := list(islice(iterador, TAMANO_LOTE_CONSOLIDACION)):
+            with instrumentos.etapa("triage"):
+                banderas.update(banderas_triage(triage_perfiles(lote)))
+            for perfil in lote:
+                if not perfil["fuentes_encontradas"]:
+                    continue
+                if seleccion is None or perfil["cedula"] in seleccion:
+                    yield perfil
+                    continue
+                analisis = motor.cache.obtener(huella_perfil(perfil, VERSION_PROMPT))
+                if analisis is None:
+                    analisis = analisis_triage(banderas.get(perfil["cedula"]) or banderas_vacias())
+                escribir(perfil, analisis)
+
+    if motor.lote:
+        analizados = analizar_concurrente_por_lotes(
+            para_llm(),
+            lambda lote: analizar_lote_con_cache(lote, motor),
+            motor.tamano_lote,
+            concurrencia
+        )
+    else:
+        analizados = analizar_concurrente(
+            para_llm(),
+            lambda perfil: analizar_con_cache(perfil, motor.individual, motor.cache),
+            concurrencia
+        )
+    for perfil, analisis in analizados:
+        escribir(perfil, analisis)
+    escritor.vaciar()
+    return procesados
+
+# Con triage_top, una pasada previa por lotes elige los N clientes de mayor
+# puntaje que van al LLM; de ella solo queda ese conjunto de cédulas.
+def preparar_triage(triage_top, cedulas):
+    if not triage_top:
+        return None
+    with instrumentos.etapa("triage.seleccion"):
+        seleccion = seleccionar_para_llm(db, cedulas, triage_top)
+    print(f"🚦 Triage: {len(seleccion):,} clientes seleccionados para el LLM")
+    return seleccion
 
 # ─── GENERAR VISTA 360 COMPLETA ───────────────────────────────
-def generar_vista360_todos():
-    cedulas = obtener_todas_cedulas()
-    resultados = []
-    print(f"🔍 Procesando {len(cedulas)} clientes únicos...")
-
-    for i, cedula in enumerate(cedulas[:10]):  # Primero 10 para prueba
-        perfil = consolidar_perfil(cedula)
-        if perfil["fuentes_encontradas"]:
-            analisis = analizar_cliente(perfil)
-            resultados.append({
-                "cedula": cedula,
-                "nombre": perfil.get("nombre", "Sin nombre"),
-                "ciudad": perfil.get("ciudad", "Sin ciudad"),
-                "fuentes": perfil["fuentes_encontradas"],
-                "analisis": analisis,
-                "perfil_completo": perfil
-            })
-            print(f"✅ {i+1}. {perfil.get('nombre', cedula)} procesado")
-
-    # Guardar en MongoDB
-    db.vista360.drop()
-    if resultados:
-        db.vista360.insert_many(resultados)
-    print(f"\n✅ Vista 360 generada para {len(resultados)} clientes")
+# Se construye en una colección sombra y se reemplaza vista360 con un
+# rename atómico, así el dashboard nunca ve la colección vacía. La cola
+# del asesor se reconstruye igual, en su propia sombra.
+def generar_vista360_todos(modelo_ia=None, concurrencia=GEMINI_CONCURRENCIA, limite=None,
+                           triage_top=TRIAGE_TOP):
+    inicio = datetime.now()
+    token = token_actual_cambios(db)
+    crear_indices(db, COLECCIONES_FUENTE)
+    print("🔍 Procesando clientes únicos...")
+
+    sombra = db.vista360_nueva
+    sombra.drop()
+    sombra.create_indexes(INDICES["vista360"])
+    sombra_cola = db.cola_asesor_nueva
+    sombra_cola.drop()
+    sombra_cola.create_indexes(INDICES["cola_asesor"])
+    estadisticas = EstadisticasVista360(db.vista360_stats)
+    escritor = EscritorVista360(sombra, estadisticas=estadisticas, cola=ColaAsesor(sombra_cola))
+    motor = MotorAnalisis(modelo_ia)
+    seleccion = preparar_triage(triage_top, islice(iterar_cedulas(), limite))
+    procesados = procesar_perfiles(
+        consolidar_perfiles(islice(iterar_cedulas(), limite)),
+        escritor, motor, concurrencia, seleccion
+    )
+    sombra.rename("vista360", dropTarget=True)
+    sombra_cola.rename("cola_asesor", dropTarget=True)
+    estadisticas.reemplazar()
+    guardar_control(db, inicio, token)
+    instrumentos.contar("clientes.procesados", procesados)
+    instrumentos.contar("cache.aciertos", motor.cache.aciertos)
+
+    print(f"\n✅ Vista 360 generada para {procesados} clientes")
     print("   Colección creada: vista360")
-    return resultados
+    print(f"   {motor.cache.resumen()}")
+    return procesados
+
+# ─── REFRESCO INCREMENTAL ─────────────────────────────────────
+def refrescar_vista360_incremental(modelo_ia=None, concurrencia=GEMINI_CONCURRENCIA,
+                                   triage_top=TRIAGE_TOP):
+    inicio = datetime.now()
+    control = leer_control(db)
+    if not control.get("marca_agua"):
+        print("ℹ️ Sin ejecución previa registrada, se hace reconstrucción completa")
+        return generar_vista360_todos(modelo_ia, concurrencia, triage_top=triage_top)
+
+    cedulas, token = detectar_cedulas_modificadas(db, control)
+    print(f"🔍 {len(cedulas)} clientes con cambios desde {control['marca_agua']:%Y-%m-%d %H:%M}")
+
+    db.cola_asesor.create_indexes(INDICES["cola_asesor"])
+    escritor = EscritorVista360(
+        db.vista360, upsert=True, estadisticas=EstadisticasVista360(db.vista360_stats),
+        cola=ColaAsesor(db.cola_asesor)
+    )
+    motor = MotorAnalisis(modelo_ia)
+    seleccion = preparar_triage(triage_top, cedulas)
+    procesados = procesar_perfiles(
+        consolidar_perfiles(sorted(cedulas)),
+        escritor, motor, concurrencia, seleccion
+    )
+    guardar_control(db, inicio, token)
+    instrumentos.contar("clientes.procesados", procesados)
+    instrumentos.contar("cache.aciertos", motor.cache.aciertos)
+
+    print(f"\n✅ Vista 360 actualizada para {procesados} clientes")
+    print(f"   {motor.cache.resumen()}")
+    return procesados
 
 # ─── EJECUTAR ─────────────────────────────────────────────────
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motor de Inteligencia VISTA 360")
+    parser.add_argument("--incremental", action="store_true", help="solo clientes con cambios")
+    parser.add_argument("--limite", type=int, default=None, help="máximo de clientes (pruebas)")
+    parser.add_argument("--triage-top", type=int, default=TRIAGE_TOP,
+                        help="solo los N clientes de mayor puntaje van al LLM (0 = todos)")
+    parser.add_argument("--perfilar", metavar="ARCHIVO",
+                        help="guarda un perfil cProfile (.prof) de la ejecución")
+    args = parser.parse_args()
+
     print("🚀 Iniciando Motor de Inteligencia VISTA 360...")
-    resultados = generar_vista360_todos()
-    if resultados:
-        print("\n📋 EJEMPLO — Primer cliente analizado:")
+    perfilador = cProfile.Profile() if args.perfilar else None
+    if perfilador:
+        perfilador.enable()
+    with instrumentos.etapa("ejecucion_total"):
+        if args.incremental:
+            procesados = refrescar_vista360_incremental(triage_top=args.triage_top)
+        else:
+            procesados = generar_vista360_todos(limite=args.limite, triage_top=args.triage_top)
+    if perfilador:
+        perfilador.disable()
+        perfilador.dump_stats(args.perfilar)
+        print(f"🧪 Perfil guardado en {args.perfilar} (snakeviz / pstats)")
+
+    print("\n⏱️ TIEMPOS POR ETAPA")
+    print(instrumentos.tabla())
+    print(f"   Reporte: {instrumentos.guardar_reporte()}")
+    ejemplo = db.vista360.find_one({}, {"nombre": 1, "fuentes": 1, "analisis": 1})
+    if procesados and ejemplo:
+        print("\n📋 EJEMPLO — Cliente analizado:")
         print("─" * 50)
-        print(f"Cliente: {resultados[0]['nombre']}")
-        print(f"Fuentes: {', '.join(resultados[0]['fuentes'])}")
+        print(f"Cliente: {ejemplo['nombre']}")
+        print(f"Fuentes: {', '.join(ejemplo['fuentes'])}")
 
-        print(f"\nAnálisis:\n{resultados[0]['analisis']}")
+        print(f"\nAnálisis:\n{ejemplo['analisis']}")